@@ -28,45 +28,77 @@ ckan.module("comments-thread", function ($) {
     },
     initialize: function () {
       $.proxyAll(this, /_on/);
-      this.$(".comment-actions .remove-comment").on(
-        "click",
-        this._onRemoveComment
-      );
-      this.$(".comment-actions .approve-comment").on(
-        "click",
-        this._onApproveComment
-      );
-      this.$(".comment-actions .draft-comment").on(
-        "click",
-        this._onDraftComment
-      );
-      this.$(".comment-actions .reply-to-comment").on(
-        "click",
-        this._onReplyToComment
-      );
-      this.$(".comment-actions .edit-comment").on("click", this._onEditComment);
-      this.$(".comment-actions .save-comment").on("click", this._onSaveComment);
-      this.$(".comment-footer").on("click", this._onFooterClick);
-      this.$(".comment-form").off("submit").on("submit", this._onSubmit);
+      // handlers are delegated, so that replies loaded on demand get them too
+      var on = (event, selector, handler) =>
+        this.el.on(event + ".comments", selector, handler);
+
+      on("click", ".comment-actions .remove-comment", this._onRemoveComment);
+      on("click", ".comment-actions .approve-comment", this._onApproveComment);
+      on("click", ".comment-actions .draft-comment", this._onDraftComment);
+      on("click", ".comment-actions .reply-to-comment", this._onReplyToComment);
+      on("click", ".comment-actions .edit-comment", this._onEditComment);
+      on("click", ".comment-actions .save-comment", this._onSaveComment);
+      on("click", ".comment-footer", this._onFooterClick);
+      on("click", ".toggle-replies", this._onToggleReplies);
+      on("click", ".load-more-replies", this._onLoadMoreReplies);
+      on("submit", ".comment-form", this._onSubmit);
       this.$("#block_comments").on("click", this._onBlockComments);
       this.$("#unblock_comments").on("click", this._onUnblockComments);
 
     },
     teardown: function () {
-      this.$(".comment-action.remove-comment").off(
-        "click",
-        this._onRemoveComment
-      );
-      this.$(".comment-actions .approve-comment").off(
-        "click",
-        this._onApproveComment
-      );
-      this.$(".comment-actions .draft-comment").off(
-        "click",
-        this._onDraftComment
-      );
+      this.el.off(".comments");
+    },
+    _onToggleReplies: function (e) {
+      var link = e.currentTarget;
+      var replies = $("#replies-" + link.dataset.commentId);
+
+      if (replies.is(":visible")) {
+        replies.hide();
+        link.textContent = link.dataset.showText;
+        return;
+      }
 
-      this.$(".comment-form").off("submit", this._onSubmit);
+      if (link.dataset.repliesUrl && !link.dataset.loaded) {
+        link.dataset.loaded = "true";
+        this._loadReplies(link.dataset.repliesUrl, replies, null, function () {
+          delete link.dataset.loaded;
+        });
+      }
+      replies.show();
+      link.textContent = link.dataset.hideText;
+    },
+    _onLoadMoreReplies: function (e) {
+      var placeholder = $(e.currentTarget).closest("li");
+      this._loadReplies(
+        e.currentTarget.dataset.repliesUrl,
+        placeholder.parent(),
+        placeholder
+      );
+    },
+    _loadReplies: function (url, container, placeholder, onError) {
+      var self = this;
+      $.get(url)
+        .done(function (html) {
+          if (placeholder) {
+            placeholder.replaceWith(html);
+          } else {
+            container.append(html);
+          }
+        })
+        .fail(function () {
+          if (onError) {
+            onError();
+          }
+          var oldEl = self.sandbox.notify.el;
+          self.sandbox.notify.el = container.closest(".comments-comment");
+          self.sandbox.notify(
+            self._("An Error Occurred").fetch(),
+            self._("Answers cannot be loaded").fetch(),
+            "error"
+          );
+          self.sandbox.notify.el = oldEl;
+        });
     },
     _onFooterClick: function (e) {
       if (e.target.classList.contains("cancel-reply")) {
@@ -339,60 +371,52 @@ const $target = $('#formNewComment');
   }
 });
 
-var btns = document.querySelectorAll('[id^="addNewComment"]');
-
-var forms = document.querySelectorAll('[id^="formNewComment"]');
-
-
-btns.forEach(function(btn) {
-  btn.addEventListener("click", function() {
-    var parts = btn.id.split('_');
-    var suffix = parts.length > 1 ? parts[1] : '';
-
-    var formId = "formNewComment" + (suffix ? '_' + suffix : '');
-    var form = document.getElementById(formId);
-
-    forms.forEach(function(otherForm) {
-
-      $(".comment.edit-in-progress")
-      .removeClass(".edit-in-progress")
-      .find(".comment-action.save-comment")
-      .addClass("hidden")
-      .prevObject.find(".comment-action.edit-comment")
-      .removeClass("hidden")
-      .prevObject.find(".edit-textarea-wrapper")
-      .remove()
-      .prevObject.find(".comment-content")
-      .removeClass("hidden"); 
-
-      if (otherForm.style.display === "block") {
-        otherForm.style.display = "none";
-        document.getElementById('addNewComment').style.display = "block";
-
-        var otherBtn = document.getElementById('addNewComment_' + otherForm.dataset.id);
-        if (otherBtn) {
-          otherBtn.style.display = "inline";
-        }
+// delegated, so that buttons and forms of replies loaded on demand work as well
+$(document).on("click", '[id^="addNewComment"]', function() {
+  var btn = this;
+  var parts = btn.id.split('_');
+  var suffix = parts.length > 1 ? parts[1] : '';
+
+  var formId = "formNewComment" + (suffix ? '_' + suffix : '');
+  var form = document.getElementById(formId);
+  var forms = document.querySelectorAll('[id^="formNewComment"]');
+
+  forms.forEach(function(otherForm) {
+
+    $(".comment.edit-in-progress")
+    .removeClass(".edit-in-progress")
+    .find(".comment-action.save-comment")
+    .addClass("hidden")
+    .prevObject.find(".comment-action.edit-comment")
+    .removeClass("hidden")
+    .prevObject.find(".edit-textarea-wrapper")
+    .remove()
+    .prevObject.find(".comment-content")
+    .removeClass("hidden"); 
+
+    if (otherForm.style.display === "block") {
+      otherForm.style.display = "none";
+      document.getElementById('addNewComment').style.display = "block";
+
+      var otherBtn = document.getElementById('addNewComment_' + otherForm.dataset.id);
+      if (otherBtn) {
+        otherBtn.style.display = "inline";
       }
-    });
-
-    form.style.display = "block";
-    btn.style.display = "none";
+    }
   });
-});
-
-forms.forEach(function(form) {
 
-  form.addEventListener("submit", function() {
-    var submitButton = form.querySelector('button[type="submit"]');
+  form.style.display = "block";
+  btn.style.display = "none";
+});
 
-    submitButton.disabled = true;
+$(document).on("submit", '[id^="formNewComment"]', function() {
+  var submitButton = this.querySelector('button[type="submit"]');
 
-  });
+  submitButton.disabled = true;
 });
 
 
-$("div[id^='confirmation-modal-']").on('click', function() {
+$(document).on('click', "div[id^='confirmation-modal-']", function() {
   var id = this.id;
   
   if($('#'+id+' .send-email-notification').is(":checked")) {
@@ -0,0 +1,163 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Process-local index of blocked subjects.
+
+Blocked subjects are rare, so all of them are kept in memory. Every worker
+compares the version stamp of the table (number of rows and the newest
+`blocked_at`) with the stamp of its index at most once per refresh interval
+and reloads the index when they differ. Changes made by the worker itself are
+applied immediately.
+
+For every subject type the index holds canonical IDs and names of blocked
+subjects, so checks by ID or by name are answered without queries.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from typing import Any, Optional
+
+import sqlalchemy as sa
+
+import ckan.model as model
+
+from . import config
+from .exceptions import UnsupportedSubjectType
+from .model import BlockedEntity
+
+# IDs of core entities are UUIDs, which are never used as names
+CANONICAL_ID = re.compile(
+    r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$"
+)
+
+_lock = threading.Lock()
+# identifiers of every blocked subject, keyed by the stored `(type, id)`
+_subjects: dict[tuple[str, str], frozenset[str]] = {}
+# identifiers of all blocked subjects of the type
+_index: dict[str, frozenset[str]] = {}
+_stamp: Optional[tuple[Any, ...]] = None
+_checked_at: Optional[float] = None
+
+
+def _current_stamp() -> tuple[Any, ...]:
+    return tuple(
+        model.Session.query(
+            sa.func.count(BlockedEntity.id), sa.func.max(BlockedEntity.blocked_at)
+        ).one()
+    )
+
+
+def _identifiers(type_: str, id_: str) -> frozenset[str]:
+    """Stored ID of the subject together with its canonical ID and name."""
+    identifiers = {id_}
+    try:
+        subject = BlockedEntity.locate_subject(type_, id_)
+    except UnsupportedSubjectType:
+        subject = None
+
+    for attr in ["id", "name"]:
+        value = getattr(subject, attr, None)
+        if value:
+            identifiers.add(str(value))
+    return frozenset(identifiers)
+
+
+def _build_index(
+    subjects: dict[tuple[str, str], frozenset[str]]
+) -> dict[str, frozenset[str]]:
+    index: dict[str, set[str]] = {}
+    for (type_, _id), identifiers in subjects.items():
+        index.setdefault(type_, set()).update(identifiers)
+    return {type_: frozenset(ids) for type_, ids in index.items()}
+
+
+def refresh(force: bool = False):
+    """Reload the index if the table was changed by another worker."""
+    global _subjects, _index, _stamp, _checked_at
+
+    now = time.monotonic()
+    if (
+        not force
+        and _checked_at is not None
+        and now - _checked_at < config.blocked_refresh_interval()
+    ):
+        return
+
+    stamp = _current_stamp()
+    with _lock:
+        _checked_at = now
+        if stamp == _stamp and not force:
+            return
+
+    rows = model.Session.query(BlockedEntity.subject_type, BlockedEntity.subject_id)
+    subjects = {(type_, id_): _identifiers(type_, id_) for type_, id_ in rows}
+    with _lock:
+        _subjects = subjects
+        _index = _build_index(subjects)
+        _stamp = stamp
+
+
+def reset():
+    global _subjects, _index, _stamp, _checked_at
+    with _lock:
+        _subjects = {}
+        _index = {}
+        _stamp = None
+        _checked_at = None
+
+
+def mark_blocked(type_: str, id_: str):
+    global _index
+    identifiers = _identifiers(type_, id_)
+    with _lock:
+        _subjects[(type_, id_)] = identifiers
+        _index = _build_index(_subjects)
+
+
+def mark_unblocked(type_: str, id_: str):
+    global _index
+    with _lock:
+        _subjects.pop((type_, id_), None)
+        _index = _build_index(_subjects)
+
+
+def is_blocked(type_: str, id_: Optional[str]) -> bool:
+    """Check if comments of the subject are blocked.
+
+    The subject is located only when `id_` is neither a known identifier nor
+    a canonical ID, e.g. a new name of a subject renamed after it was blocked.
+    """
+    if not id_:
+        return False
+
+    refresh()
+    identifiers = _index.get(type_)
+    if not identifiers:
+        return False
+    if id_ in identifiers:
+        return True
+    if CANONICAL_ID.match(id_):
+        return False
+
+    try:
+        subject = BlockedEntity.locate_subject(type_, id_)
+    except UnsupportedSubjectType:
+        return False
+    return subject is not None and str(subject.id) in identifiers
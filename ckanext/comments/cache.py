@@ -0,0 +1,229 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Cache of rendered comment threads.
+
+Fragments are keyed by thread ID, viewer class and the version of the
+thread. The version is bumped whenever one of the comment signals is sent for
+the thread, which makes all previously rendered fragments unreachable.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Protocol
+
+import ckan.model as model
+
+from . import config, signals
+from .utils import is_moderator
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "ckanext-comments"
+
+
+class Backend(Protocol):
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        ...
+
+    def incr(self, key: str) -> int:
+        ...
+
+
+class LRUBackend:
+    """In-process storage limited by the number of items."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._data: OrderedDict[str, tuple[Optional[float], Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            _expires_at, value = self._data.get(key, (None, 0))
+            value = int(value) + 1
+            self._data[key] = (None, value)
+            self._data.move_to_end(key)
+            return value
+
+
+class RedisBackend:
+    """Storage shared by all the workers.
+
+    Any object implementing `get`, `setex` and `incr` the same way as the
+    redis client can be used as a `client`.
+    """
+
+    def __init__(self, client: Any = None):
+        if client is None:
+            from ckan.lib.redis import connect_to_redis
+
+            client = connect_to_redis()
+        self.client = client
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(key)
+        if isinstance(value, bytes):
+            value = value.decode("utf8")
+        return value
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        self.client.setex(key, ttl, value)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(key)
+
+
+_backend: Optional[Backend] = None
+_backend_ready = False
+
+
+def get_backend() -> Optional[Backend]:
+    """Storage for fragments or None, if the cache is disabled."""
+    global _backend, _backend_ready
+    if not _backend_ready:
+        _backend = _make_backend(config.fragment_cache_backend())
+        _backend_ready = True
+    return _backend
+
+
+def set_backend(backend: Optional[Backend]):
+    global _backend, _backend_ready
+    _backend = backend
+    _backend_ready = True
+
+
+def reset_backend():
+    global _backend, _backend_ready
+    _backend = None
+    _backend_ready = False
+
+
+def _make_backend(name: str) -> Optional[Backend]:
+    if name == "memory":
+        return LRUBackend(config.fragment_cache_size())
+    if name == "redis":
+        return RedisBackend()
+    if name != "none":
+        log.warning("Unknown fragment cache backend: %s", name)
+    return None
+
+
+def _version_key(thread_id: str) -> str:
+    return f"{KEY_PREFIX}:thread-version:{thread_id}"
+
+
+def thread_version(backend: Backend, thread_id: str) -> int:
+    return int(backend.get(_version_key(thread_id)) or 0)
+
+
+def viewer_class(user: Optional[model.User], thread: Any) -> str:
+    """Group of viewers that receive the same rendered thread.
+
+    Anonymous users share a single group. Authenticated users and moderators
+    see their name and permissions in the thread, so their fragments are
+    additionally scoped by the user ID.
+    """
+    if user is None:
+        return "anonymous"
+    if user.sysadmin or is_moderator(user, None, thread):
+        return f"moderator-{user.id}"
+    return f"authenticated-{user.id}"
+
+
+def fragment_key(backend: Backend, thread_id: str, viewer: str, *extra: Any) -> str:
+    version = thread_version(backend, thread_id)
+    parts = [KEY_PREFIX, "thread", thread_id, str(version), viewer]
+    parts.extend(str(part) for part in extra)
+    return ":".join(parts)
+
+
+def invalidate_thread(thread_id: Optional[str]):
+    backend = get_backend()
+    if backend is None or not thread_id:
+        return
+
+    try:
+        backend.incr(_version_key(thread_id))
+    except Exception:
+        log.exception("Cannot invalidate cached fragments of thread %s", thread_id)
+
+
+def get_fragment(key: str) -> Optional[str]:
+    backend = get_backend()
+    if backend is None:
+        return None
+    try:
+        return backend.get(key)
+    except Exception:
+        log.exception("Cannot read cached fragment %s", key)
+        return None
+
+
+def set_fragment(key: str, value: str):
+    backend = get_backend()
+    if backend is None:
+        return
+    try:
+        backend.set(key, value, config.fragment_cache_ttl())
+    except Exception:
+        log.exception("Cannot cache fragment %s", key)
+
+
+def _on_thread_changed(sender: Any, **kwargs: Any):
+    invalidate_thread(sender)
+
+
+for _signal in [signals.created, signals.approved, signals.updated, signals.deleted]:
+    _signal.connect(_on_thread_changed)
@@ -0,0 +1,129 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+from __future__ import annotations
+
+import itertools
+import json
+import time
+from typing import IO, Any, Iterator
+
+import click
+
+import ckan.plugins.toolkit as tk
+
+from . import digests, mailer, outbox, utils
+
+
+def get_commands():
+    return [comments]
+
+
+@click.group(short_help="ckanext-comments CLI")
+def comments():
+    pass
+
+
+@comments.command("sync-roles")
+@click.option("--full", is_flag=True, help="Copy all users, not only changed ones.")
+@click.option("--background", is_flag=True, help="Enqueue a background job.")
+def sync_roles(full: bool, background: bool):
+    """Copy moderator roles from Drupal into the CKAN database."""
+    if background:
+        job = tk.enqueue_job(
+            utils.sync_user_roles, kwargs={"full": full}, title="comments: sync roles"
+        )
+        click.secho(f"Job {job.id} enqueued", fg="green")
+        return
+
+    count = utils.sync_user_roles(full=full)
+    click.secho(f"Synced roles of {count} users", fg="green")
+
+
+@comments.command("send-emails")
+@click.option("--limit", type=int, default=100, help="Messages per batch.")
+def send_emails(limit: int):
+    """Send pending emails from the outbox."""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = outbox.deliver_pending(limit)
+        total_sent += sent
+        total_failed += failed
+        if sent + failed < limit:
+            break
+    mailer.close()
+
+    click.secho(f"Sent {total_sent} emails, {total_failed} failed", fg="green")
+
+
+@comments.command("send-digests")
+@click.option("--background", is_flag=True, help="Enqueue a background job.")
+def send_digests(background: bool):
+    """Send pending comment notifications to organizations as digests."""
+    if background:
+        job = tk.enqueue_job(digests.send_digests, title="comments: send digests")
+        click.secho(f"Job {job.id} enqueued", fg="green")
+        return
+
+    count = digests.send_digests()
+    click.secho(f"Enqueued {count} digests", fg="green")
+
+
+@comments.command("import")
+@click.argument("source", type=click.File("r", encoding="utf8"))
+@click.option("--batch-size", type=int, default=1000, help="Comments per transaction.")
+def import_comments(source: IO[str], batch_size: int):
+    """Import comments from the JSONL file. Use `-` to read from stdin."""
+    site_user = tk.get_action("get_site_user")({"ignore_auth": True}, {})
+    action = tk.get_action("comments_comment_import")
+
+    created = skipped = 0
+    start = time.perf_counter()
+    for first_line, batch in _batches(source, batch_size):
+        try:
+            result = action({"user": site_user["name"]}, {"comments": batch})
+        except tk.ValidationError as e:
+            tk.error_shout(
+                f"Batch starting at line {first_line} is not imported: {e.error_dict}"
+            )
+            raise click.Abort()
+
+        created += result["created"]
+        skipped += result["skipped"]
+        click.echo(f"{created} comments imported")
+
+    elapsed = time.perf_counter() - start
+    rate = created / elapsed if elapsed else 0
+    click.secho(
+        f"Imported {created} comments, skipped {skipped} existing"
+        f" in {elapsed:.1f}s ({rate:.0f} comments/s)",
+        fg="green",
+    )
+
+
+def _batches(source: IO[str], size: int) -> Iterator[tuple[int, list[Any]]]:
+    """Parsed records grouped into batches, with the number of the first line."""
+    lines = (
+        (number, line) for number, line in enumerate(source, 1) if line.strip()
+    )
+    while batch := list(itertools.islice(lines, size)):
+        records = []
+        for number, line in batch:
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                raise click.BadParameter(f"line {number}: {e}", param_hint="SOURCE")
+        yield batch[0][0], records
@@ -17,6 +17,7 @@
 
 from __future__ import annotations
 
+import os
 from typing import Any, Callable, Optional
 
 from werkzeug.utils import import_string
@@ -47,6 +48,72 @@ DEFAULT_MODERATOR_CHECKER = "ckanext.comments.utils:comments_is_moderator"
 CONFIG_ENABLE_DATASET = "ckanext.comments.enable_default_dataset_comments"
 DEFAULT_ENABLE_DATASET = False
 
+CONFIG_ORDER = "ckanext.comments.order"
+DEFAULT_ORDER = "newest"
+
+CONFIG_REPLIES_ORDER = "ckanext.comments.replies_order"
+DEFAULT_REPLIES_ORDER = "oldest"
+
+CONFIG_DRUPAL_CONNECTION = "ckanext.dge_drupal_users.connection"
+
+CONFIG_DRUPAL_POOL_SIZE = "ckanext.comments.drupal.pool_size"
+DEFAULT_DRUPAL_POOL_SIZE = 5
+
+CONFIG_DRUPAL_MAX_OVERFLOW = "ckanext.comments.drupal.max_overflow"
+DEFAULT_DRUPAL_MAX_OVERFLOW = 5
+
+CONFIG_DRUPAL_POOL_RECYCLE = "ckanext.comments.drupal.pool_recycle"
+DEFAULT_DRUPAL_POOL_RECYCLE = 3600
+
+CONFIG_ROLES_CACHE_TTL = "ckanext.comments.drupal.roles_cache_ttl"
+DEFAULT_ROLES_CACHE_TTL = 60
+
+CONFIG_ROLES_SOURCE = "ckanext.comments.roles.source"
+DEFAULT_ROLES_SOURCE = "drupal"
+
+CONFIG_BLOCKED_REFRESH = "ckanext.comments.blocked.refresh_interval"
+DEFAULT_BLOCKED_REFRESH = 10
+
+CONFIG_EMAIL_DELIVERY = "ckanext.comments.email.delivery"
+DEFAULT_EMAIL_DELIVERY = "outbox"
+
+CONFIG_OUTBOX_JOB = "ckanext.comments.email.outbox_job"
+DEFAULT_OUTBOX_JOB = True
+
+CONFIG_OUTBOX_MAX_ATTEMPTS = "ckanext.comments.email.max_attempts"
+DEFAULT_OUTBOX_MAX_ATTEMPTS = 5
+
+CONFIG_OUTBOX_RETRY_DELAY = "ckanext.comments.email.retry_delay"
+DEFAULT_OUTBOX_RETRY_DELAY = 60
+
+CONFIG_SMTP_MAX_IDLE = "ckanext.comments.smtp.max_idle"
+DEFAULT_SMTP_MAX_IDLE = 60
+
+CONFIG_SMTP_MAX_MESSAGES = "ckanext.comments.smtp.max_messages"
+DEFAULT_SMTP_MAX_MESSAGES = 100
+
+CONFIG_EMAIL_TEMPLATES = "ckanext.comments.template.emails"
+DEFAULT_EMAIL_TEMPLATES = os.path.join(
+    os.path.dirname(__file__), "templates", "comments", "emails"
+)
+
+CONFIG_EMAIL_BYTECODE_CACHE = "ckanext.comments.email.bytecode_cache"
+
+CONFIG_DIGEST_ORGANIZATIONS = "ckanext.comments.digest.organizations"
+DEFAULT_DIGEST_ORGANIZATIONS = ""
+
+CONFIG_RECIPIENTS_CACHE_TTL = "ckanext.comments.recipients.cache_ttl"
+DEFAULT_RECIPIENTS_CACHE_TTL = 300
+
+CONFIG_FRAGMENT_CACHE = "ckanext.comments.fragment_cache.backend"
+DEFAULT_FRAGMENT_CACHE = "none"
+
+CONFIG_FRAGMENT_CACHE_SIZE = "ckanext.comments.fragment_cache.size"
+DEFAULT_FRAGMENT_CACHE_SIZE = 1000
+
+CONFIG_FRAGMENT_CACHE_TTL = "ckanext.comments.fragment_cache.ttl"
+DEFAULT_FRAGMENT_CACHE_TTL = 300
+
 
 def approval_required() -> bool:
     return tk.asbool(tk.config.get(CONFIG_REQUIRE_APPROVAL, DEFAULT_REQUIRE_APPROVAL))
@@ -99,3 +166,102 @@ def use_default_dataset_comments() -> bool:
 def moderator_checker() -> Optional[Callable[[Any, Any, Any], bool]]:
     checker = tk.config.get(CONFIG_MODERATOR_CHECKER, DEFAULT_MODERATOR_CHECKER)
     return import_string(checker, silent=True)
+
+
+def newest_first() -> bool:
+    return tk.config.get(CONFIG_ORDER, DEFAULT_ORDER) == "newest"
+
+
+def replies_newest_first() -> bool:
+    return tk.config.get(CONFIG_REPLIES_ORDER, DEFAULT_REPLIES_ORDER) == "newest"
+
+
+def drupal_connection() -> Optional[str]:
+    return tk.config.get(CONFIG_DRUPAL_CONNECTION)
+
+
+def drupal_pool_size() -> int:
+    return tk.asint(tk.config.get(CONFIG_DRUPAL_POOL_SIZE, DEFAULT_DRUPAL_POOL_SIZE))
+
+
+def drupal_max_overflow() -> int:
+    return tk.asint(
+        tk.config.get(CONFIG_DRUPAL_MAX_OVERFLOW, DEFAULT_DRUPAL_MAX_OVERFLOW)
+    )
+
+
+def drupal_pool_recycle() -> int:
+    return tk.asint(
+        tk.config.get(CONFIG_DRUPAL_POOL_RECYCLE, DEFAULT_DRUPAL_POOL_RECYCLE)
+    )
+
+
+def roles_cache_ttl() -> int:
+    return tk.asint(tk.config.get(CONFIG_ROLES_CACHE_TTL, DEFAULT_ROLES_CACHE_TTL))
+
+
+def roles_source() -> str:
+    return tk.config.get(CONFIG_ROLES_SOURCE, DEFAULT_ROLES_SOURCE)
+
+
+def blocked_refresh_interval() -> int:
+    return tk.asint(tk.config.get(CONFIG_BLOCKED_REFRESH, DEFAULT_BLOCKED_REFRESH))
+
+
+def email_delivery() -> str:
+    return tk.config.get(CONFIG_EMAIL_DELIVERY, DEFAULT_EMAIL_DELIVERY)
+
+
+def outbox_job() -> bool:
+    return tk.asbool(tk.config.get(CONFIG_OUTBOX_JOB, DEFAULT_OUTBOX_JOB))
+
+
+def outbox_max_attempts() -> int:
+    return tk.asint(
+        tk.config.get(CONFIG_OUTBOX_MAX_ATTEMPTS, DEFAULT_OUTBOX_MAX_ATTEMPTS)
+    )
+
+
+def outbox_retry_delay() -> int:
+    return tk.asint(tk.config.get(CONFIG_OUTBOX_RETRY_DELAY, DEFAULT_OUTBOX_RETRY_DELAY))
+
+
+def smtp_max_idle() -> int:
+    return tk.asint(tk.config.get(CONFIG_SMTP_MAX_IDLE, DEFAULT_SMTP_MAX_IDLE))
+
+
+def smtp_max_messages() -> int:
+    return tk.asint(tk.config.get(CONFIG_SMTP_MAX_MESSAGES, DEFAULT_SMTP_MAX_MESSAGES))
+
+
+def email_templates() -> str:
+    return tk.config.get(CONFIG_EMAIL_TEMPLATES) or DEFAULT_EMAIL_TEMPLATES
+
+
+def email_bytecode_cache() -> Optional[str]:
+    """Folder for compiled templates; None when the option is missing."""
+    return tk.config.get(CONFIG_EMAIL_BYTECODE_CACHE)
+
+
+def digest_organizations() -> set[str]:
+    return set(
+        tk.aslist(tk.config.get(CONFIG_DIGEST_ORGANIZATIONS, DEFAULT_DIGEST_ORGANIZATIONS))
+    )
+
+
+def recipients_cache_ttl() -> int:
+    return tk.asint(
+        tk.config.get(CONFIG_RECIPIENTS_CACHE_TTL, DEFAULT_RECIPIENTS_CACHE_TTL)
+    )
+
+
+def fragment_cache_backend() -> str:
+    return tk.config.get(CONFIG_FRAGMENT_CACHE, DEFAULT_FRAGMENT_CACHE)
+
+
+def fragment_cache_size() -> int:
+    return tk.asint(tk.config.get(CONFIG_FRAGMENT_CACHE_SIZE, DEFAULT_FRAGMENT_CACHE_SIZE))
+
+
+def fragment_cache_ttl() -> int:
+    return tk.asint(tk.config.get(CONFIG_FRAGMENT_CACHE_TTL, DEFAULT_FRAGMENT_CACHE_TTL))
@@ -0,0 +1,137 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Periodic summaries of new comments for the editors of organizations.
+
+When the digest is enabled for an organization, new comments on its datasets
+are stored in `comments_pending_notifications` instead of being emailed right
+away. `send_digests` then sends a single email per organization that lists
+all the pending comments.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Any, Optional
+
+import ckan.model as model
+from ckan.lib import helpers as h
+
+from . import config, emails, outbox, recipients
+from .model import Comment, PendingNotification, Thread
+
+log = logging.getLogger(__name__)
+
+
+def enabled_for(organization_id: Optional[str]) -> bool:
+    """Check if notifications of the organization are sent as digests.
+
+    Organizations are listed by ID or name; `*` enables digests for all of
+    them.
+    """
+    if not organization_id:
+        return False
+
+    organizations = config.digest_organizations()
+    if not organizations:
+        return False
+    if "*" in organizations or organization_id in organizations:
+        return True
+
+    group = model.Group.get(organization_id)
+    return group is not None and group.name in organizations
+
+
+def add(comment: dict[str, Any], organization_id: str):
+    """Postpone the notification about the comment. Session is not committed."""
+    model.Session.add(
+        PendingNotification(comment_id=comment["id"], organization_id=organization_id)
+    )
+
+
+def send_digests() -> int:
+    """Send a digest to every organization with pending notifications.
+
+    All pending notifications are fetched with a single query ordered by
+    organization. Processed notifications are removed in the same transaction
+    that stores emails in the outbox. Returns the number of digests.
+    """
+    rows = (
+        model.Session.query(PendingNotification, Comment, model.Package)
+        .join(Comment, Comment.id == PendingNotification.comment_id)
+        .join(Thread, Thread.id == Comment.thread_id)
+        .join(model.Package, model.Package.id == Thread.subject_id)
+        .order_by(
+            PendingNotification.organization_id,
+            Comment.created_at,
+            Comment.id,
+        )
+        .with_for_update(of=PendingNotification, skip_locked=True)
+        .all()
+    )
+
+    settings = emails.settings()
+    sent = 0
+    for organization_id, group in itertools.groupby(
+        rows, lambda row: row[0].organization_id
+    ):
+        group = list(group)
+        mail_to = list(recipients.editor_emails(organization_id))
+        if mail_to:
+            _enqueue_digest(mail_to, group, settings)
+            sent += 1
+        else:
+            log.info("Organization %s has no editors to notify", organization_id)
+
+        for notification, _comment, _package in group:
+            model.Session.delete(notification)
+
+    model.Session.commit()
+    if sent:
+        outbox.schedule_delivery()
+    return sent
+
+
+def _enqueue_digest(mail_to: list[str], rows: list[Any], settings: dict[str, Any]):
+    comments = []
+    for _notification, comment, package in rows:
+        comments.append(
+            {
+                "node_title": package.title,
+                "url_name": settings["site_url"] + "/es/catalogo/" + package.name,
+                "comment_created": h.render_datetime(comment.created_at),
+                "comment_name": comment.username,
+                "comment_email": comment.email,
+                "comment_content": comment.content,
+            }
+        )
+
+    body = emails.render("email_organismo_digest.html", comments=comments)
+
+    mail_ccs = settings["mail_cc"]
+    msg = MIMEMultipart()
+    msg["From"] = settings["mail_from"]
+    msg["To"] = ", ".join(mail_to)
+    if mail_ccs:
+        msg["Cc"] = ", ".join(mail_ccs)
+    msg["Subject"] = settings["subject_digest"]
+    msg.attach(MIMEText(body, "html"))
+
+    outbox.enqueue(mail_to + mail_ccs, msg)
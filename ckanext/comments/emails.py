@@ -0,0 +1,113 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Rendering of notification emails.
+
+Templates are compiled once per process and their bytecode is kept on disk,
+so other workers and restarts skip the compilation as well. Values that come
+from the config are read once and bound to the templates as globals; only
+the data of the particular email is passed on every render.
+"""
+
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+from typing import Any, Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+
+import ckan.plugins.toolkit as tk
+
+from . import config
+
+
+@lru_cache(maxsize=None)
+def settings() -> dict[str, Any]:
+    """Config values used by the emails, read once per process."""
+    return {
+        "url": tk.config.get("ckanext.comments.url.images.drupal"),
+        "url_logos": tk.config.get("ckanext.comments.url.image.logos"),
+        "url_image_subscribe": tk.config.get("ckanext.comments.url.image.subscribe"),
+        "url_subscribe": tk.config.get("ckanext.comments.url.subscribe"),
+        "site_url": tk.config.get("ckan.site_url"),
+        "site_title": tk.config.get("ckan.site_title"),
+        "mail_from": tk.config.get("smtp.mail_from"),
+        "subject_user": tk.config.get("ckanext.comments.email.subject.send_mail_user"),
+        "subject_organization": tk.config.get(
+            "ckanext.comments.email.subject.send_mail_organismo"
+        ),
+        "subject_digest": tk.config.get(
+            "ckanext.comments.email.subject.send_mail_organismo_digest"
+        )
+        or tk.config.get("ckanext.comments.email.subject.send_mail_organismo"),
+        "subject_approved": tk.config.get(
+            "ckanext.comments.email.subject.comment_approved_init"
+        ),
+        "mail_cc": [
+            cc for cc in tk.config.get("smtp.mail_cc", "").split(" ") if cc
+        ],
+    }
+
+
+def _bytecode_cache() -> Optional[FileSystemBytecodeCache]:
+    directory = config.email_bytecode_cache()
+    if directory is None:
+        # jinja creates a folder owned by the current user and refuses to
+        # use it if somebody else has access to it
+        return FileSystemBytecodeCache()
+    if not directory:
+        return None
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
+
+
+@lru_cache(maxsize=None)
+def environment(path: str) -> Environment:
+    """Environment shared by all the emails from the templates folder."""
+    return Environment(
+        loader=FileSystemLoader(path),
+        bytecode_cache=_bytecode_cache(),
+        auto_reload=tk.asbool(tk.config.get("debug", False)),
+    )
+
+
+@lru_cache(maxsize=None)
+def _constants() -> dict[str, Any]:
+    data = settings()
+    return {
+        key: data[key]
+        for key in ["url", "url_logos", "url_image_subscribe", "url_subscribe"]
+    }
+
+
+def _template(path: str, name: str) -> Template:
+    # compiled templates are cached by the environment. They are checked for
+    # changes only in debug mode
+    return environment(path).get_template(name, globals=_constants())
+
+
+def render(name: str, **variables: Any) -> str:
+    """Render the email template with the given variables."""
+    return _template(config.email_templates(), name).render(**variables)
+
+
+def reset():
+    """Forget compiled templates and config values."""
+    settings.cache_clear()
+    _constants.cache_clear()
+    environment.cache_clear()
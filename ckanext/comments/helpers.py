@@ -20,11 +20,13 @@ from __future__ import annotations
 from typing import Any, Optional
 
 from datetime import datetime
+from markupsafe import Markup
+
 import ckan.model as model
 import ckan.plugins.toolkit as tk
 from ckan.lib.i18n import get_available_locales
 
-from ckanext.comments.model.thread import Subject
+from ckanext.comments.model.thread import Subject, Thread
 
 from typing import List, Dict
 from datetime import datetime
@@ -33,8 +35,9 @@ from ckan.common import (
     _, ungettext, g, c, request, session, json
 )
 
-from . import config
+from . import blocked, cache, config
 from .model import Comment
+from .utils import author_label, get_author_labels
 import logging
 import re
 
@@ -56,8 +59,21 @@ def helper(func):
     return func
 
 
+def linked_comment() -> Optional[str]:
+    """ID of the comment referenced by the current URL."""
+    try:
+        return request.args.get("commentId")
+    except RuntimeError:
+        return None
+
+
 @helper
 def thread_for(id_: Optional[str], type_: str) -> dict[str, Any]:
+    """Thread of the subject with top-level comments.
+
+    Replies are fetched on demand, unless the URL points to a specific comment,
+    that must be visible right after the page is loaded.
+    """
     thread = tk.get_action("comments_thread_show")(
         {},
         {
@@ -65,13 +81,60 @@ def thread_for(id_: Optional[str], type_: str) -> dict[str, Any]:
             "subject_type": type_,
             "include_comments": True,
             "combine_comments": True,
+            "newest_first": config.newest_first(),
+            "replies_newest_first": config.replies_newest_first(),
             "include_author": True,
+            "author_fields": ["id", "name", "fullname"],
+            "include_author_label": True,
+            "include_capabilities": True,
+            "include_replies": bool(linked_comment()),
             "init_missing": True,
         },
     )
     return thread
 
 
+@helper
+def thread_comments_html(id_: Optional[str], type_: str) -> Markup:
+    """Rendered list of comments for the subject.
+
+    When the fragment cache is enabled, the output is reused until any comment
+    of the thread changes.
+    """
+    backend = cache.get_backend()
+    if backend is None or linked_comment():
+        return _render_thread_comments(id_, type_)
+
+    thread = Thread.for_subject(type_, id_)
+    if thread is None:
+        return Markup("")
+
+    user = getattr(g, "userobj", None) or None
+    key = cache.fragment_key(
+        backend,
+        thread.id,
+        cache.viewer_class(user, thread),
+        tk.h.lang(),
+        is_a_blocked_entity(id_, type_),
+    )
+    html = cache.get_fragment(key)
+    if html is None:
+        html = _render_thread_comments(id_, type_)
+        cache.set_fragment(key, html)
+    return Markup(html)
+
+
+def _render_thread_comments(id_: Optional[str], type_: str) -> Markup:
+    thread = thread_for(id_, type_)
+    return tk.render_snippet(
+        "comments/snippets/thread_comments.html",
+        thread=thread,
+        subject_id=thread["subject_id"],
+        subject_type=thread["subject_type"],
+        fragment_cache=cache.get_backend() is not None and not linked_comment(),
+    )
+
+
 @helper
 def mobile_depth_threshold() -> int:
     return config.mobile_depth_threshold()
@@ -175,42 +238,13 @@ def is_admin_author(author_id) -> bool:
 
 def get_my_author(author_id, comment) -> str:
     if not author_id or author_id == 'id_no_encontrado':
-       
-        username = comment.get('username', None)
-        
-        if not username:
-            return _("anonymous")
-        return username
-    else: 
-
-        is_admin = is_admin_author(author_id)
-
-        if is_admin:
-            return "datos.gob.es"
-        else:
-        
-            try:
-                query = '''
-                SELECT m.table_id , m.group_id 
-                        FROM "member" m 
-                        WHERE table_id =  :author_id and m.state = 'active' '''
-                result = model.Session.execute(query, {'author_id':author_id})
-                row = result.fetchone()  
-                table_id, group_id = row
-                
-                if not group_id:
-                    return _("anonymous")
-                else:
-                    query_organismo = '''
-                    select g.title from "group" g where id =  :group_id '''
-                    result = model.Session.execute(query_organismo, {'group_id':group_id})
-                    row_organismo = result.fetchone()
-                    if row_organismo:
-                        title = row_organismo[0] 
-                        return title
-            except Exception as e:
-                log.error('helpers.py comments: No se ha podido obtener el usuario: %s', e)
-                return None
+        return author_label(comment, {})
+    try:
+        labels = get_author_labels([author_id])
+    except Exception as e:
+        log.error('helpers.py comments: No se ha podido obtener el usuario: %s', e)
+        return None
+    return author_label(dict(comment, author_id=author_id), labels)
 
 
 @helper
@@ -221,21 +255,7 @@ def get_organismo(comment) -> str:
 
 @helper
 def is_a_blocked_entity(id_: Optional[str], type_: str) -> bool:
-    blocked_entity = None
-    try:
-        blocked_entity = tk.get_action("comments_blocked_entity_show")(
-            {},
-            {
-                "subject_id": id_,
-                "subject_type": type_
-            },
-        )
-        if blocked_entity:
-            return True
-    except tk.ObjectNotFound:
-        return False
-    log.info('return False')
-    return False
+    return blocked.is_blocked(type_, id_)
 
 @helper
 def dge_comment_public_name() -> str:
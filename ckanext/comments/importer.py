@@ -0,0 +1,183 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Bulk import of existing comments, e.g. from the old Drupal portal.
+
+Records keep their IDs, timestamps, states and reply links. Threads of all
+the subjects are created by a single statement and comments are inserted by
+a batched executemany. Neither emails nor signals are produced; counters of
+the affected threads are recalculated at the end.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import namedtuple
+from typing import Any, Iterable
+
+from sqlalchemy.dialects.postgresql import insert
+
+import ckan.model as model
+import ckan.plugins.toolkit as tk
+from ckan.model.types import make_uuid
+
+from .model import Comment, Thread
+
+log = logging.getLogger(__name__)
+
+Position = namedtuple("Position", ["thread_id", "root_id", "depth", "path"])
+
+FIELDS = ["content", "author_type", "state", "email", "username", "consent", "extras"]
+
+
+def import_comments(records: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """Insert validated records. Session is not committed.
+
+    Replies must follow their parents, unless parents are already stored.
+    Comments that already exist are skipped, so an interrupted import can be
+    repeated. Returns number of `created` and `skipped` comments and IDs of
+    affected `threads`.
+    """
+    records = list(records)
+    if not records:
+        return {"created": 0, "skipped": 0, "threads": []}
+
+    existing = {
+        id_
+        for (id_,) in model.Session.query(Comment.id).filter(
+            Comment.id.in_({r["id"] for r in records})
+        )
+    }
+    records = [r for r in records if r["id"] not in existing]
+    skipped = len(existing)
+
+    threads = _ensure_threads(records)
+    positions = _stored_parents(records)
+
+    rows = []
+    errors = []
+    seen: set[str] = set()
+    for record in records:
+        if record["id"] in seen:
+            errors.append(f"Comment {record['id']}: duplicated ID")
+            continue
+        seen.add(record["id"])
+
+        thread_id = threads[(record["subject_type"], record["subject_id"])]
+        parent = None
+        reply_to_id = record.get("reply_to_id")
+        if reply_to_id:
+            parent = positions.get(reply_to_id)
+            if parent is None:
+                errors.append(f"Comment {record['id']}: missing parent {reply_to_id}")
+                continue
+            if parent.thread_id != thread_id:
+                errors.append(
+                    f"Comment {record['id']}: parent {reply_to_id} is owned by"
+                    " different thread"
+                )
+                continue
+
+        columns = Comment.tree_columns(record["id"], record["created_at"], parent)
+        positions[record["id"]] = Position(thread_id, **columns)
+
+        row = {field: record.get(field) for field in FIELDS}
+        row.update(columns)
+        row.update(
+            id=record["id"],
+            thread_id=thread_id,
+            # anonymous comments have no author, as in `comment_create`
+            author_id=record.get("author_id") or "",
+            reply_to_id=reply_to_id,
+            created_at=record["created_at"],
+            modified_at=record.get("modified_at"),
+        )
+        rows.append(row)
+
+    if errors:
+        raise tk.ValidationError({"comments": errors})
+
+    if rows:
+        model.Session.execute(Comment.__table__.insert(), rows)
+
+    affected = sorted({row["thread_id"] for row in rows})
+    for thread_id in affected:
+        Thread.refresh_counters(thread_id)
+
+    return {"created": len(rows), "skipped": skipped, "threads": affected}
+
+
+def _ensure_threads(records: list[dict[str, Any]]) -> dict[tuple[str, str], str]:
+    """Thread IDs of all the subjects, keyed by the subject in the record.
+
+    Subjects may be identified by names; the record is updated with the
+    canonical ID.
+    """
+    canonical: dict[tuple[str, str], tuple[str, str]] = {}
+    # the oldest comment defines the age of the thread
+    created: dict[tuple[str, str], Any] = {}
+    errors = []
+    for record in records:
+        key = (record["subject_type"], record["subject_id"])
+        if key not in canonical:
+            subject = Thread.locate_subject(*key)
+            if subject is None:
+                errors.append(f"Cannot find subject {key[0]} {key[1]}")
+                continue
+            canonical[key] = (key[0], str(subject.id))
+        record["subject_id"] = canonical[key][1]
+        pair = canonical[key]
+        if pair not in created or record["created_at"] < created[pair]:
+            created[pair] = record["created_at"]
+
+    if errors:
+        raise tk.ValidationError({"comments": errors})
+
+    if created:
+        model.Session.execute(
+            insert(Thread.__table__)
+            .values(
+                [
+                    {
+                        "id": make_uuid(),
+                        "subject_type": type_,
+                        "subject_id": id_,
+                        "created_at": created_at,
+                    }
+                    for (type_, id_), created_at in created.items()
+                ]
+            )
+            .on_conflict_do_nothing(index_elements=["subject_id", "subject_type"])
+        )
+
+    return {key: thread.id for key, thread in Thread.for_subjects(created).items()}
+
+
+def _stored_parents(records: list[dict[str, Any]]) -> dict[str, Position]:
+    """Positions of parents that are not part of the import."""
+    ids = {r["id"] for r in records}
+    parents = {r["reply_to_id"] for r in records if r.get("reply_to_id")} - ids
+    if not parents:
+        return {}
+
+    rows = model.Session.query(
+        Comment.id, Comment.thread_id, Comment.root_id, Comment.depth, Comment.path
+    ).filter(Comment.id.in_(parents))
+    return {
+        row.id: Position(row.thread_id, row.root_id, row.depth, row.path)
+        for row in rows
+    }
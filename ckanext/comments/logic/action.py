@@ -16,37 +16,56 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 from datetime import datetime
+from functools import partial
 
 
 import ckan.lib.helpers as h
 
-from ckan.plugins import toolkit
 import ckan.model as model
+from ckan.model.types import make_uuid
 import sqlalchemy as sa
 from sqlalchemy.ext.declarative import DeclarativeMeta
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from jinja2 import Environment, FileSystemLoader
-from ckan.lib.mailer import MailerException
 
 import ckan.plugins.toolkit as tk
 from ckan.logic import validate
-from ckan.plugins.toolkit import config as conf
 from ckan.common import  _
 from ..helpers import is_a_blocked_entity
 
 import json
 
+import ckanext.comments.logic.auth as auth
 import ckanext.comments.logic.schema as schema
 from ckanext.comments.model import Comment, Thread, BlockedEntity
-from ckanext.comments.model.dictize import get_dictizer
+from ckanext.comments.model.dictize import (
+    attach_reply_counts,
+    dictize_comments,
+    get_dictizer,
+    paginate_comments,
+    visible_comments,
+)
 
 import ckan.lib.helpers as h
 
-from ..utils import get_roles_by_author_id, serialize,flatten_join_prefix
-
-from .. import config, signals
+from ..utils import (
+    get_roles_by_author_id,
+    serialize,
+    flatten_join_prefix,
+    user_belong_to_same_organization,
+)
+
+from .. import (
+    blocked,
+    cache,
+    config,
+    digests,
+    emails,
+    importer,
+    outbox,
+    recipients,
+    signals,
+)
 
 import logging
 log = logging.getLogger(__name__)
@@ -119,6 +138,12 @@ def thread_create(context, data_dict):
     return thread_dict
 
 
+def _capabilities(context, thread):
+    """Compute permissions of the viewer once and apply them per comment."""
+    viewer = auth.viewer_capabilities(context, thread)
+    return partial(auth.comment_capabilities, viewer)
+
+
 @action
 @validate(schema.thread_show)
 def thread_show(context, data_dict):
@@ -130,8 +155,23 @@ def thread_show(context, data_dict):
         init_missing(bool, optional): return an empty thread instead of 404
         include_comments(bool, optional): show comments from the thread
         include_author(bool, optional): show authors of the comments
+        author_fields(list[str], optional): show only these fields of the authors
+        include_author_label(bool, optional): add the public label of the authors
         combine_comments(bool, optional): combine comments into a tree-structure
+        newest_first(bool, optional): show top-level comments from the newest
+        replies_newest_first(bool, optional): show replies from the newest.
+            Applied only when comments are combined
         after_date(str:ISO date, optional): show comments only since the given date
+        limit(int, optional): number of top-level comments per page. Replies
+            of these comments are always included. When set, response
+            contains `next_cursor`
+        cursor(str, optional): `next_cursor` from the previous page
+        include_replies(bool, optional): show replies. When disabled, only
+            top-level comments are returned, each with its `reply_count`
+        max_depth(int, optional): show only comments nested up to this level.
+            Top-level comments have depth 0
+        include_capabilities(bool, optional): add `can_delete`, `can_approve`,
+            `can_draft` and `can_edit` flags of the current user to comments
     """
     tk.check_access("comments_thread_show", context, data_dict)
     thread = Thread.for_subject(
@@ -145,14 +185,94 @@ def thread_show(context, data_dict):
     context["include_comments"] = data_dict["include_comments"]
     context["combine_comments"] = data_dict["combine_comments"]
     context["include_author"] = data_dict["include_author"]
+    context["author_fields"] = data_dict.get("author_fields")
+    context["include_author_label"] = data_dict["include_author_label"]
     context["after_date"] = data_dict.get("after_date")
 
     context["newest_first"] = data_dict["newest_first"]
+    context["replies_newest_first"] = data_dict["replies_newest_first"]
+    context["limit"] = data_dict.get("limit")
+    context["cursor"] = data_dict.get("cursor")
+    context["include_replies"] = data_dict["include_replies"]
+    context["max_depth"] = data_dict.get("max_depth")
+    if data_dict["include_capabilities"]:
+        context["capabilities"] = _capabilities(context, thread)
 
     thread_dict = get_dictizer(type(thread))(thread, context)
     return thread_dict
 
 
+@action
+@validate(schema.thread_show_many)
+def thread_show_many(context, data_dict):
+    """Show threads of multiple subjects at once.
+
+    All the threads are fetched by a single query. Subjects are matched by
+    their canonical IDs, names are not resolved.
+
+    Args:
+        subjects(list): up to 100 pairs `[subject_type, subject_id]` or
+            objects with `subject_type` and `subject_id` keys
+        include_counts(bool, optional): show counters and `last_comment_at`
+            of the threads
+        latest(int, optional): show up to N (at most 20) newest approved
+            comments of every thread
+
+    Returns:
+        list: a thread or None for every subject, in the order of `subjects`
+    """
+    tk.check_access("comments_thread_show_many", context, data_dict)
+    subjects = data_dict["subjects"]
+    threads = Thread.for_subjects(subjects)
+
+    latest = {}
+    if data_dict["latest"]:
+        latest = Comment.latest_by_thread(
+            [t.id for t in threads.values()], data_dict["latest"]
+        )
+
+    result = []
+    for subject in subjects:
+        thread = threads.get(subject)
+        if thread is None:
+            result.append(None)
+            continue
+
+        thread_dict = get_dictizer(type(thread))(thread, context.copy())
+        if not data_dict["include_counts"]:
+            for field in [
+                "comment_count",
+                "approved_count",
+                "draft_count",
+                "last_comment_at",
+            ]:
+                thread_dict.pop(field)
+        thread_dict["comments"] = None
+        if data_dict["latest"]:
+            thread_dict["comments"] = dictize_comments(
+                latest.get(thread.id, []), context.copy()
+            )
+        result.append(thread_dict)
+
+    return result
+
+
+@action
+@validate(schema.thread_summary)
+def thread_summary(context, data_dict):
+    """Show the number of comments and the last activity of the thread.
+
+    Args:
+        id(str): ID of the thread
+    """
+    tk.check_access("comments_thread_summary", context, data_dict)
+    thread = context["session"].query(Thread).get(data_dict["id"])
+    if thread is None:
+        raise tk.ObjectNotFound("Thread not found")
+
+    return get_dictizer(type(thread))(thread, context)
+
+
 @action
 @validate(schema.thread_delete)
 def thread_delete(context, data_dict):
@@ -177,6 +297,33 @@ def thread_delete(context, data_dict):
     return thread_dict
 
 
+def _thread_for_comment(data_dict):
+    """ID of the thread that receives the comment.
+
+    Missing thread is inserted in the transaction of the comment when
+    `create_thread` is enabled.
+    """
+    subject = Thread.locate_subject(data_dict["subject_type"], data_dict["subject_id"])
+    subject_id = str(subject.id) if subject else data_dict["subject_id"]
+
+    if data_dict["create_thread"]:
+        if subject is None:
+            raise tk.ObjectNotFound("Cannot find subject for thread")
+        return Thread.upsert(data_dict["subject_type"], subject_id)
+
+    thread_id = (
+        model.Session.query(Thread.id)
+        .filter(
+            Thread.subject_type == data_dict["subject_type"],
+            Thread.subject_id == subject_id,
+        )
+        .scalar()
+    )
+    if thread_id is None:
+        raise tk.ObjectNotFound("Thread not found")
+    return thread_id
+
+
 @action
 @validate(schema.comment_create)
 def comment_create(context, data_dict):
@@ -190,22 +337,8 @@ def comment_create(context, data_dict):
         create_thread(bool, optional): create a new thread if it doesn't exist yet
     """
     _check_blocked(data_dict)
-    
-    thread_data = {
-        "subject_id": data_dict["subject_id"],
-        "subject_type": data_dict["subject_type"],
-    }
-    try:
-        thread_dict = tk.get_action("comments_thread_show")(context.copy(), thread_data)
-    except tk.ObjectNotFound:
-        if not data_dict["create_thread"]:
-            raise
-        try:
-            thread_dict = tk.get_action("comments_thread_create")(
-                context.copy(), thread_data
-            )
-        except Exception as e:
-            log.error("Ocurrió un error al crear el hilo de comentarios: {e}")    
+
+    thread_id = _thread_for_comment(data_dict)
 
     author_id = data_dict.get("author_id")
     email_comment = data_dict["email"]
@@ -224,17 +357,21 @@ def comment_create(context, data_dict):
        
     
     reply_to_id = data_dict.get("reply_to_id")
+    parent = None
     
     if reply_to_id:
-        parent = tk.get_action("comments_comment_show")(
-            context.copy(), {"id": reply_to_id}
-        )
-        if parent["thread_id"] != thread_dict["id"]:
+        # copy of the context shares loaded comments with the original
+        tk.check_access("comments_comment_show", context.copy(), {"id": reply_to_id})
+        parent = Comment.for_context(context, reply_to_id)
+        if parent is None:
+            raise tk.ObjectNotFound("Comment not found")
+        if parent.thread_id != thread_id:
             raise tk.ValidationError(
                 {"reply_to_id": ["Coment is owned by different thread"]}
             )
     comment = Comment(
-        thread_id=thread_dict["id"],
+        id=make_uuid(),
+        thread_id=thread_id,
         content=data_dict["content"],
         author_type=data_dict["author_type"],
         extras=data_dict["extras"],
@@ -243,7 +380,10 @@ def comment_create(context, data_dict):
         consent = data_dict["consent"],
         author_id=author_id,
         reply_to_id=reply_to_id,
+        created_at=datetime.utcnow(),
     )
+    comment.place_under(parent)
+    author = None
     try:
         author = comment.get_author()
     except Exception as e:
@@ -260,19 +400,31 @@ def comment_create(context, data_dict):
     
     
     context["session"].add(comment)
-    context["session"].commit()
+    approved = comment.is_approved()
+    Thread.update_counters(
+        comment.thread_id,
+        approved=int(approved),
+        draft=int(not approved),
+        last_comment_at=comment.created_at,
+    )
     comment_dict = get_dictizer(type(comment))(comment, context)
 
-    signals.created.send(comment.thread_id, comment=comment_dict)
-
+    # emails are stored in the transaction of the comment. Savepoints keep
+    # the comment when an email cannot be built
     try:
-        generate_send_user_mail( author,data_dict)
+        with context["session"].begin_nested():
+            generate_send_user_mail( author,data_dict)
     except Exception as e:
         log.error(f"Ocurrió un error al enviar el correo electrónico al usuario: {e}")
     try:
-        generate_send_organism_mail(comment_dict, data_dict)
+        with context["session"].begin_nested():
+            generate_send_organism_mail(comment_dict, data_dict)
     except Exception as e:
         log.error(f"Ocurrió un error al enviar el correo electrónico al organismo: {e}")
+    context["session"].commit()
+
+    signals.created.send(comment.thread_id, comment=comment_dict)
+    outbox.schedule_delivery()
     return comment_dict
 
 
@@ -342,34 +494,13 @@ def approve_comment_by_role(author,comment,data_dict):
     
     if author is not None:
            
-            rows = get_roles_by_author_id(author)
-            
-            for row in rows:
-                if row.role == ROLE_ADMINISTRATOR or row.role == ROLE_APORTA:
+            for role in get_roles_by_author_id(author):
+                if role == ROLE_ADMINISTRATOR or role == ROLE_APORTA:
                     comment.approve()
                     break
-                if row.role == ROLE_PUBLICADOR and user_belong_to_same_organization(author,data_dict):
+                if role == ROLE_PUBLICADOR and user_belong_to_same_organization(author, data_dict["subject_id"]):
                     comment.approve()
 
-def user_belong_to_same_organization( author, data_dict):
-    email_belong_to = False
-
-    user_author = model.User.get(author.id)
-    email_commenting_user = user_author.email
-
-    package = model.Package.get(data_dict["subject_id"])
-    members = toolkit.get_action('member_list')(
-        data_dict={'id': package.owner_org, 'table_name': 'user', 'capacity': 'editor', 'state': 'active'})
-
-    for member in members:
-        user = model.User.get(member[0])
-        if user and user.email == email_commenting_user:
-            email_belong_to = True 
-    
-    return email_belong_to
-
-
-
 def generate_send_user_mail(  author,data_dict):
 
     if author is None:
@@ -377,23 +508,13 @@ def generate_send_user_mail(  author,data_dict):
     else: 
         addressee = author.email
     
-    subject = conf.get('ckanext.comments.email.subject.send_mail_user')
-    path = conf.get('ckanext.comments.template.emails') 
-    url = conf.get('ckanext.comments.url.images.drupal')
-    url_logos = conf.get('ckanext.comments.url.image.logos')
-    url_image_subscribe = conf.get('ckanext.comments.url.image.subscribe')
-    url_subscribe = conf.get('ckanext.comments.url.subscribe')
-    env =  Environment(loader=FileSystemLoader(path))
-    
- 
-    template_usuario = env.get_template('email_usuario.html')
- 
-    body = template_usuario.render(url=url, url_logos=url_logos, url_image_subscribe=url_image_subscribe, url_subscribe=url_subscribe, email=addressee, mensaje=data_dict["content"] )
+    settings = emails.settings()
+    body = emails.render('email_usuario.html', email=addressee, mensaje=data_dict["content"])
     if addressee:
         msg = MIMEMultipart()
-        msg['From'] = conf.get('smtp.mail_from')
+        msg['From'] = settings['mail_from']
         msg['To'] = addressee
-        msg['Subject'] = subject
+        msg['Subject'] = settings['subject_user']
 
         msg.attach(MIMEText(body, 'html'))
 
@@ -403,36 +524,27 @@ def generate_send_user_mail(  author,data_dict):
 def generate_send_organism_mail(comment, data_dict):
 
     package = model.Package.get(data_dict["subject_id"])
-    members = toolkit.get_action('member_list')(
-         data_dict={'id':  package.owner_org, 'table_name': 'user', 'capacity': 'editor', 'state': 'active'})
-   
-    mail_to = []
-    for member in members:
-        user = model.User.get(member[0])
-        if user and  user.state == 'active' and user.email and len(user.email) > 0:
-            mail_to.append(user.email)
+    if digests.enabled_for(package.owner_org):
+        digests.add(comment, package.owner_org)
+        return
+
+    mail_to = list(recipients.editor_emails(package.owner_org))
 
+    settings = emails.settings()
     #CC
-    mail_ccs = conf.get('smtp.mail_cc', '').split(' ')
+    mail_ccs = settings['mail_cc']
     
-    subject = conf.get('ckanext.comments.email.subject.send_mail_organismo') 
-    path = conf.get('ckanext.comments.template.emails') 
-    url = conf.get('ckanext.comments.url.images.drupal')
-    url_logos = conf.get('ckanext.comments.url.image.logos')
-    url_image_subscribe = conf.get('ckanext.comments.url.image.subscribe')
-    url_subscribe = conf.get('ckanext.comments.url.subscribe')
+    subject = settings['subject_organization']
     node_title = package.title
     comment_created = h.render_datetime(comment['created_at'])
     comment_name = comment['username']
     comment_email = comment['email']
     comment_content= comment['content']
 
-    url_name = conf.get('ckan.site_url')+'/es/catalogo/'+package.name
-    email_from = conf.get('smtp.mail_from')
-    env =  Environment(loader=FileSystemLoader(path))
-    template_organismo = env.get_template('email_organismo.html')
+    url_name = settings['site_url']+'/es/catalogo/'+package.name
+    email_from = settings['mail_from']
  
-    body = template_organismo.render(url=url, url_name=url_name, url_logos=url_logos, url_image_subscribe=url_image_subscribe, url_subscribe=url_subscribe, node_title=node_title, comment_created=comment_created,comment_name=comment_name,comment_email=comment_email,comment_content=comment_content )
+    body = emails.render('email_organismo.html', url_name=url_name, node_title=node_title, comment_created=comment_created,comment_name=comment_name,comment_email=comment_email,comment_content=comment_content )
 
     if mail_to:
         addressees = ', '.join(mail_to)
@@ -449,53 +561,38 @@ def generate_send_organism_mail(comment, data_dict):
 
 
 def send_email( addressees, msg):
-    from socket import error as socket_error
+    """Store the email in the outbox, it's sent after the commit."""
+    outbox.enqueue(addressees, msg)
 
-    if addressees and msg:
 
-        smtp_connection = smtplib.SMTP()
-        smtp_server = conf.get('smtp.server', 'localhost')
-        smtp_starttls = False
-        smtp_user = conf.get('smtp.user')
-        smtp_password = conf.get('smtp.password')
-        try:
-            
-            smtp_connection.connect(smtp_server)
-            smtp_connection.ehlo()
-
-
-            if smtp_starttls:
-                if smtp_connection.has_extn('STARTTLS'):
-                    smtp_connection.starttls()
-                    smtp_connection.ehlo()
-                else:
-                    raise MailerException("SMTP server does not support STARTTLS")
-
-            if smtp_user:
-                assert smtp_password, ("If smtp.user is configured then "
-                                        "smtp.password must be configured as well.")
-                smtp_connection.login(smtp_user, smtp_password)
-            email_from = conf.get('smtp.mail_from')
-            smtp_connection.sendmail(email_from,addressees, msg.as_string())
-            smtp_connection.quit()
-          
-
-        except smtplib.SMTPException as e:
-            msg = '%r' % e
-            log.exception(msg)
-            raise MailerException(msg)
-        except AttributeError as e:
-            msg = '%r' % e
-            log.exception(msg)
-            raise MailerException(msg)
-        except socket_error as e:
-            log.exception(e)
-            raise MailerException(e)
-    else:
-        log.info("Skip sending email. addressees ({0})  aren't correct".format(addressees))
+@action
+@validate(schema.comment_import)
+def comment_import(context, data_dict):
+    """Import existing comments, keeping their IDs, dates and states.
 
+    Threads are created when missing. Emails and signals are not sent.
+    Comments that already exist are skipped. Replies must follow their
+    parents unless the parents were imported earlier.
 
+    Args:
+        comments(list[dict]): comments with `id`, `subject_id`, `subject_type`,
+            `content` and `created_at`, and optionally `author_id`,
+            `author_type`, `state`, `reply_to_id`, `modified_at`, `email`,
+            `username`, `consent` and `extras`
 
+    Returns:
+        dict: number of `created` and `skipped` comments and number of
+            affected `threads`
+    """
+    tk.check_access("comments_comment_import", context, data_dict)
+    result = importer.import_comments(data_dict.get("comments", []))
+    context["session"].commit()
+
+    Comment.forget_context(context)
+    for thread_id in result["threads"]:
+        cache.invalidate_thread(thread_id)
+
+    return dict(result, threads=len(result["threads"]))
 
 
 @action
@@ -508,18 +605,63 @@ def comment_show(context, data_dict):
         id(str): ID of the comment
     """
     tk.check_access("comments_comment_show", context, data_dict)
-    comment = (
-        context["session"]
-        .query(Comment)
-        .filter(Comment.id == data_dict["id"])
-        .one_or_none()
-    )
+    comment = Comment.for_context(context, data_dict["id"])
     if comment is None:
         raise tk.ObjectNotFound("Comment not found")
     comment_dict = get_dictizer(type(comment))(comment, context)
     return comment_dict
 
 
+@action
+@validate(schema.replies_list)
+def replies_list(context, data_dict):
+    """Show direct replies to the comment.
+
+    Every reply contains `reply_count`, the number of its own direct replies,
+    which can be used to fetch the next level.
+
+    Args:
+        id(str): ID of the parent comment
+        limit(int, optional): number of replies per page
+        cursor(str, optional): `next_cursor` from the previous page
+        newest_first(bool, optional): show replies from the newest
+        include_author(bool, optional): show authors of the replies
+        author_fields(list[str], optional): show only these fields of the authors
+        include_author_label(bool, optional): add the public label of the authors
+        include_capabilities(bool, optional): add permission flags of the
+            current user to replies
+    """
+    tk.check_access("comments_replies_list", context, data_dict)
+    parent = Comment.for_context(context, data_dict["id"])
+    if parent is None:
+        raise tk.ObjectNotFound("Comment not found")
+
+    context["include_author"] = data_dict["include_author"]
+    context["author_fields"] = data_dict.get("author_fields")
+    context["include_author_label"] = data_dict["include_author_label"]
+    if data_dict["include_capabilities"]:
+        context["capabilities"] = _capabilities(context, parent.thread)
+
+    query = visible_comments(Comment.by_thread(parent.thread_id), parent.thread, context)
+    replies, next_cursor = paginate_comments(
+        query,
+        data_dict["limit"],
+        data_dict.get("cursor"),
+        newest_first=data_dict["newest_first"],
+        include_replies=False,
+        parent_id=parent.id,
+    )
+
+    replies_dictized = dictize_comments(replies, context, parents=[parent])
+    attach_reply_counts(replies_dictized, query)
+
+    return {
+        "thread_id": parent.thread_id,
+        "replies": replies_dictized,
+        "next_cursor": next_cursor,
+    }
+
+
 @action
 @validate(schema.comment_approve)
 def comment_approve(context, data_dict):
@@ -529,27 +671,23 @@ def comment_approve(context, data_dict):
         id(str): ID of the comment
     """
     tk.check_access("comments_comment_approve", context, data_dict)
-    comment = (
-        context["session"]
-        .query(Comment)
-        .filter(Comment.id == data_dict["id"])
-        .one_or_none()
-    )
+    comment = Comment.for_context(context, data_dict["id"])
     if comment is None:
         raise tk.ObjectNotFound("Comment not found")
-    comment.approve()
-    context["session"].commit()
-
+    if comment.change_state(Comment.State.approved):
+        Thread.update_counters(comment.thread_id, approved=1, draft=-1)
     comment_dict = get_dictizer(type(comment))(comment, context)
 
-    signals.approved.send(comment.thread_id, comment=comment_dict)
-
-    package_info_string=get_package_info(comment_dict)
-    package_info = json.loads(package_info_string)
     try:
-        send_email_comment_approved( comment_dict,package_info[0])
+        with context["session"].begin_nested():
+            package_info = json.loads(get_package_info(comment_dict))
+            send_email_comment_approved(comment_dict, package_info[0])
     except Exception as e:
             log.error("Ocurrió un error al enviar el email de aprobación: {e}") 
+    context["session"].commit()
+
+    signals.approved.send(comment.thread_id, comment=comment_dict)
+    outbox.schedule_delivery()
     return comment_dict
 
 
@@ -578,24 +716,15 @@ def send_email_comment_approved(comment,package_info):
     else:
         username =comment['email']
     
-    subject_init = conf.get('ckanext.comments.email.subject.comment_approved_init')
-    subject_end = conf.get('ckan.site_title')
-    subject = subject_init
-    path = conf.get('ckanext.comments.template.emails') 
-    url = conf.get('ckanext.comments.url.images.drupal')
-    url_logos = conf.get('ckanext.comments.url.image.logos')
-    url_image_subscribe = conf.get('ckanext.comments.url.image.subscribe')
-    url_subscribe = conf.get('ckanext.comments.url.subscribe')
-    url_name = conf.get('ckan.site_url')+'/es/catalogo/'+package_info['name']
-    env =  Environment(loader=FileSystemLoader(path))
-    
+    settings = emails.settings()
+    subject = settings['subject_approved']
+    subject_end = settings['site_title']
+    url_name = settings['site_url']+'/es/catalogo/'+package_info['name']
  
-    template_usuario = env.get_template('email_comment_approved.html')
- 
-    body = template_usuario.render(url=url,url_name=url_name, url_logos=url_logos, url_image_subscribe=url_image_subscribe, url_subscribe=url_subscribe, username=username,title=package_info['title'],email=comment['email'], mensaje=comment['content'], subject_end=subject_end )
+    body = emails.render('email_comment_approved.html', url_name=url_name, username=username,title=package_info['title'],email=comment['email'], mensaje=comment['content'], subject_end=subject_end )
     if comment['email']:
         msg = MIMEMultipart()
-        msg['From'] = conf.get('smtp.mail_from')
+        msg['From'] = settings['mail_from']
         msg['To'] = comment['email']
         msg['Subject'] = subject
 
@@ -608,20 +737,11 @@ def send_email_comment_deleted(  comment,data_dict):
     
     
     subject = data_dict['__extras']['subject']
-    path = conf.get('ckanext.comments.template.emails') 
-    url = conf.get('ckanext.comments.url.images.drupal')
-    url_logos = conf.get('ckanext.comments.url.image.logos')
-    url_image_subscribe = conf.get('ckanext.comments.url.image.subscribe')
-    url_subscribe = conf.get('ckanext.comments.url.subscribe')
-    env =  Environment(loader=FileSystemLoader(path))
-    
- 
-    template_usuario = env.get_template('email_comment_deleted.html')
  
-    body = template_usuario.render(url=url, url_logos=url_logos, url_image_subscribe=url_image_subscribe, url_subscribe=url_subscribe, body=data_dict['__extras']['body'] )
+    body = emails.render('email_comment_deleted.html', body=data_dict['__extras']['body'])
     if comment['email']:
         msg = MIMEMultipart()
-        msg['From'] = conf.get('smtp.mail_from')
+        msg['From'] = emails.settings()['mail_from']
         msg['To'] = comment['email']
         msg['Subject'] = subject
 
@@ -638,15 +758,11 @@ def comment_draft(context, data_dict):
         id(str): ID of the comment
     """
     tk.check_access("comments_comment_draft", context, data_dict)
-    comment = (
-        context["session"]
-        .query(Comment)
-        .filter(Comment.id == data_dict["id"])
-        .one_or_none()
-    )
+    comment = Comment.for_context(context, data_dict["id"])
     if comment is None:
         raise tk.ObjectNotFound("Comment not found")
-    comment.draft()
+    if comment.change_state(Comment.State.draft):
+        Thread.update_counters(comment.thread_id, approved=-1, draft=1)
     context["session"].commit()
 
     comment_dict = get_dictizer(type(comment))(comment, context)
@@ -666,25 +782,27 @@ def comment_delete(context, data_dict):
         id(str): ID of the comment
     """
     tk.check_access("comments_comment_delete", context, data_dict)
-    comment = (
-        context["session"]
-        .query(Comment)
-        .filter(Comment.id == data_dict["id"])
-        .one_or_none()
-    )
+    comment = Comment.for_context(context, data_dict["id"])
     if comment is None:
         raise tk.ObjectNotFound("Comment not found")
 
     context["session"].delete(comment)
-    context["session"].commit()
+    # replies are removed in cascade, so counters are recalculated from scratch
+    context["session"].flush()
+    Comment.forget_context(context)
+    Thread.refresh_counters(comment.thread_id)
     comment_dict = get_dictizer(type(comment))(comment, context)
 
-    signals.deleted.send(comment.thread_id, comment=comment_dict)
     if(len(data_dict['__extras']['subject']) != 0 and len(data_dict['__extras']['body']) != 0 ):
         try:
-            send_email_comment_deleted(comment_dict,data_dict)
+            with context["session"].begin_nested():
+                send_email_comment_deleted(comment_dict,data_dict)
         except Exception as e:
             log.error("Ocurrió un error al enviar el email de borrado: {e}") 
+    context["session"].commit()
+
+    signals.deleted.send(comment.thread_id, comment=comment_dict)
+    outbox.schedule_delivery()
     return comment_dict
 
 
@@ -699,12 +817,7 @@ def comment_update(context, data_dict):
     """
 
     tk.check_access("comments_comment_update", context, data_dict)
-    comment = (
-        context["session"]
-        .query(Comment)
-        .filter(Comment.id == data_dict["id"])
-        .one_or_none()
-    )
+    comment = Comment.for_context(context, data_dict["id"])
 
     if comment is None:
         raise tk.ObjectNotFound("Comment not found")
@@ -741,6 +854,7 @@ def blocked_entity_create(context, data_dict):
         blocked_entity.subject_type = subject_type
         context["session"].add(blocked_entity)
         context["session"].commit()
+        blocked.mark_blocked(subject_type, subject_id)
         log.info(f'[blocked_entity_create] Blocked comments for {subject_type} with ID {subject_id}.')
     blocked_entity_dict = get_dictizer(type(blocked_entity))(blocked_entity, context)
     return blocked_entity_dict
@@ -764,6 +878,7 @@ def blocked_entity_delete(context, data_dict):
     if blocked_entity:
         context["session"].delete(blocked_entity)
         context["session"].commit()
+        blocked.mark_unblocked(subject_type, blocked_entity.subject_id)
         log.info(f'[blocked_entity_delete] Unblocked comments for {subject_type} with ID {subject_id}.')
         blocked_entity_dict = get_dictizer(type(blocked_entity))(blocked_entity, context)
     else:
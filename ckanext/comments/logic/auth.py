@@ -18,7 +18,9 @@
 from __future__ import annotations
 
 import logging
+from typing import Any
 
+import ckan.model as model
 import ckan.plugins.toolkit as tk
 
 from ckanext.comments.model import Comment
@@ -44,6 +46,46 @@ def _can_edit(state: str, by_author: bool = False) -> bool:
     return False
 
 
+def viewer_capabilities(context: Any, thread: Any) -> dict[str, bool]:
+    """Permissions of the current user that are shared by all the comments of
+    the thread.
+
+    The moderator checker is called without a comment, so that it runs only
+    once per thread.
+    """
+    user = model.User.get(context.get("user") or "")
+    sysadmin = bool(user and user.sysadmin)
+    return {
+        "authenticated": user is not None,
+        "sysadmin": sysadmin,
+        "moderator": bool(
+            user is not None and not sysadmin and is_moderator(user, None, thread)
+        ),
+    }
+
+
+def comment_capabilities(viewer: dict[str, bool], comment: dict[str, Any]):
+    """Outcome of the comment auth functions for the given viewer.
+
+    Sysadmins are allowed everything by CKAN, editing, unpublishing and
+    removal are restricted to sysadmins by the auth functions below.
+    """
+    if viewer["sysadmin"]:
+        return {
+            "can_delete": True,
+            "can_approve": True,
+            "can_draft": True,
+            "can_edit": True,
+        }
+
+    return {
+        "can_delete": False,
+        "can_approve": viewer["moderator"],
+        "can_draft": False,
+        "can_edit": False,
+    }
+
+
 def auth(func):
     func.__name__ = f"comments_{func.__name__}"
     _auth[func.__name__] = func
@@ -65,6 +107,18 @@ def thread_show(context, data_dict):
     return {"success": True}
 
 
+@auth
+@tk.auth_allow_anonymous_access
+def thread_show_many(context, data_dict):
+    return {"success": True}
+
+
+@auth
+@tk.auth_allow_anonymous_access
+def thread_summary(context, data_dict):
+    return {"success": True}
+
+
 @auth
 def thread_delete(context, data_dict):
     return {"success": False}
@@ -80,24 +134,35 @@ def reply_create(context, data_dict):
     return {"success": True}
 
 
+@auth
+def comment_import(context, data_dict):
+    return {"success": False}
+
+
 @auth
 @tk.auth_allow_anonymous_access
 def comment_show(context, data_dict):
     id = tk.get_or_bust(data_dict, "id")
-    comment = context["session"].query(Comment).filter(Comment.id == id).one_or_none()
+    comment = Comment.for_context(context, id)
 
     if not comment:
         raise tk.ObjectNotFound("Comment not found")
     return {"success": comment.is_approved() or comment.is_authored_by(context["user"])}
 
 
+@auth
+@tk.auth_allow_anonymous_access
+def replies_list(context, data_dict):
+    return comment_show(context, data_dict)
+
+
 @auth
 def comment_approve(context, data_dict):
     id = data_dict.get("id")
     if not id:
         return {"success": False}
 
-    comment = context["session"].query(Comment).filter(Comment.id == id).one_or_none()
+    comment = Comment.for_context(context, id)
     if not comment:
         return {"success": False}
     return {"success": is_moderator(context["auth_user_obj"], comment, comment.thread)}
@@ -110,7 +175,7 @@ def comment_draft(context, data_dict):
     id = data_dict.get("id")
     if not id:
         return {"success": False}
-    comment = context["session"].query(Comment).filter(Comment.id == id).one_or_none()
+    comment = Comment.for_context(context, id)
     if not comment:
         return {"success": False}
     return {"success": is_moderator(context["auth_user_obj"], comment, comment.thread)}
@@ -130,7 +195,7 @@ def comment_update(context, data_dict):
     if not id:
         return {"success": False}
 
-    comment = context["session"].query(Comment).filter(Comment.id == id).one_or_none()
+    comment = Comment.for_context(context, id)
     if not comment:
         return {"success": False}
 
@@ -35,21 +35,76 @@ def thread_create(not_empty, unicode_safe):
 
 
 @validator_args
-def thread_show(default, boolean_validator, ignore_missing, isodate):
+def thread_show(
+    default,
+    boolean_validator,
+    ignore_missing,
+    isodate,
+    convert_to_list_if_string,
+    is_positive_integer,
+    natural_number_validator,
+    unicode_safe,
+):
     schema = thread_create()
     schema.update(
         {
             "newest_first": [default(False), boolean_validator],
+            "replies_newest_first": [default(False), boolean_validator],
             "init_missing": [default(False), boolean_validator],
             "include_comments": [default(False), boolean_validator],
             "include_author": [default(False), boolean_validator],
+            "author_fields": [
+                ignore_missing,
+                convert_to_list_if_string,
+                tk.get_validator("comments_author_fields"),
+            ],
+            "include_author_label": [default(False), boolean_validator],
+            "include_capabilities": [default(False), boolean_validator],
             "combine_comments": [default(False), boolean_validator],
             "after_date": [ignore_missing, isodate],
+            "limit": [ignore_missing, is_positive_integer],
+            "cursor": [
+                ignore_missing,
+                unicode_safe,
+                tk.get_validator("comments_cursor"),
+            ],
+            "include_replies": [default(True), boolean_validator],
+            "max_depth": [ignore_missing, natural_number_validator],
         }
     )
     return schema
 
 
+@validator_args
+def thread_show_many(
+    not_empty,
+    default,
+    boolean_validator,
+    int_validator,
+    natural_number_validator,
+    convert_to_json_if_string,
+):
+    return {
+        "subjects": [
+            not_empty,
+            convert_to_json_if_string,
+            tk.get_validator("comments_subject_list"),
+        ],
+        "include_counts": [default(False), boolean_validator],
+        "latest": [
+            default(0),
+            int_validator,
+            natural_number_validator,
+            tk.get_validator("comments_latest_limit"),
+        ],
+    }
+
+
+@validator_args
+def thread_summary(not_empty):
+    return {"id": [not_empty]}
+
+
 @validator_args
 def thread_delete(not_empty):
     return {"id": [not_empty]}
@@ -98,11 +153,76 @@ def comment_create(
     }
 
 
+@validator_args
+def comment_import_record(
+    not_empty,
+    ignore_missing,
+    unicode_safe,
+    one_of,
+    default,
+    boolean_validator,
+    isodate,
+    convert_to_json_if_string,
+    dict_only,
+):
+    return {
+        "id": [not_empty, unicode_safe],
+        "subject_id": [not_empty, unicode_safe],
+        "subject_type": [not_empty, unicode_safe],
+        "content": [not_empty],
+        "author_id": [ignore_missing, unicode_safe],
+        "author_type": [default("user"), one_of(["user"])],
+        "state": [default("draft"), one_of(["draft", "approved"])],
+        "reply_to_id": [ignore_missing, unicode_safe],
+        "created_at": [not_empty, isodate],
+        "modified_at": [ignore_missing, isodate],
+        "email": [ignore_missing, unicode_safe],
+        "username": [ignore_missing, unicode_safe],
+        "consent": [ignore_missing, boolean_validator],
+        "extras": [default("{}"), convert_to_json_if_string, dict_only],
+    }
+
+
+@validator_args
+def comment_import():
+    return {"comments": comment_import_record()}
+
+
 @validator_args
 def comment_show(not_empty):
     return {"id": [not_empty]}
 
 
+@validator_args
+def replies_list(
+    not_empty,
+    default,
+    boolean_validator,
+    ignore_missing,
+    convert_to_list_if_string,
+    is_positive_integer,
+    unicode_safe,
+):
+    return {
+        "id": [not_empty],
+        "limit": [default(20), is_positive_integer],
+        "newest_first": [default(False), boolean_validator],
+        "cursor": [
+            ignore_missing,
+            unicode_safe,
+            tk.get_validator("comments_cursor"),
+        ],
+        "include_author": [default(False), boolean_validator],
+        "author_fields": [
+            ignore_missing,
+            convert_to_list_if_string,
+            tk.get_validator("comments_author_fields"),
+        ],
+        "include_author_label": [default(False), boolean_validator],
+        "include_capabilities": [default(False), boolean_validator],
+    }
+
+
 @validator_args
 def comment_approve(not_empty):
     return {"id": [not_empty]}
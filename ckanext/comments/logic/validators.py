@@ -25,9 +25,14 @@ import logging
 log = logging.getLogger(__name__)
 
 from ckanext.comments.model import Comment
+from ckanext.comments.model.dictize import AUTHOR_FIELDS
+from ckanext.comments.utils import decode_cursor
 
 _validators: dict[str, Any] = {}
 
+MAX_SUBJECTS = 100
+MAX_LATEST = 20
+
 
 def validator(func: Any): 
     _validators[f"comments_{func.__name__}"] = func
@@ -40,12 +45,57 @@ def get_validators():
 
 @validator
 def comment_exists(value: Any, context: Any):
-    comment = context["session"].query(Comment).filter_by(id=value).one_or_none()
+    comment = Comment.for_context(context, value)
     if not comment:
         raise tk.Invalid("Comment does not exist")
     return value
 
 
+@validator
+def author_fields(value: Any, context: Any):
+    unknown = set(value) - set(AUTHOR_FIELDS)
+    if unknown:
+        raise tk.Invalid(f"Unsupported author fields: {', '.join(sorted(unknown))}")
+    return value
+
+
+@validator
+def cursor(value: Any, context: Any):
+    try:
+        decode_cursor(value)
+    except ValueError:
+        raise tk.Invalid("Invalid cursor")
+    return value
+
+
+@validator
+def latest_limit(value: Any, context: Any):
+    if value > MAX_LATEST:
+        raise tk.Invalid(f"Must be at most {MAX_LATEST}")
+    return value
+
+
+@validator
+def subject_list(value: Any, context: Any):
+    """Convert subjects into a list of `(subject_type, subject_id)` pairs."""
+    if not isinstance(value, list):
+        raise tk.Invalid("Must be a list of subjects")
+    if len(value) > MAX_SUBJECTS:
+        raise tk.Invalid(f"Must contain at most {MAX_SUBJECTS} subjects")
+
+    subjects = []
+    for subject in value:
+        if isinstance(subject, dict):
+            subject = [subject.get("subject_type"), subject.get("subject_id")]
+        if (
+            not isinstance(subject, (list, tuple))
+            or len(subject) != 2
+            or not all(isinstance(part, str) and part for part in subject)
+        ):
+            raise tk.Invalid(f"Invalid subject: {subject}")
+        subjects.append(tuple(subject))
+    return subjects
+
 
 @validator
 def not_empty_if_anonymous_email(key, data, errors, context):
@@ -0,0 +1,188 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""SMTP delivery with reusable connections.
+
+Every worker thread keeps its own SMTP session. A session is reused while it
+is younger than the idle timeout and answers NOOP, otherwise it's replaced.
+Messages of a batch are sent over the same connection.
+"""
+
+from __future__ import annotations
+
+import logging
+import smtplib
+import threading
+import time
+from socket import error as socket_error
+from typing import Any, Iterable, Optional
+
+import ckan.plugins.toolkit as tk
+from ckan.lib.mailer import MailerException
+
+from . import config
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+_metrics_lock = threading.Lock()
+_metrics: dict[str, float] = {}
+
+
+def _count(name: str, value: float = 1):
+    with _metrics_lock:
+        _metrics[name] = _metrics.get(name, 0) + value
+
+
+def metrics() -> dict[str, float]:
+    """Counters of the mailer.
+
+    `connections` and `reused` count opened and reused sessions, `sent` and
+    `failed` count messages and `send_seconds` is the total time spent in
+    SMTP transactions.
+    """
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+class Session:
+    """Open SMTP connection of the current thread."""
+
+    def __init__(self):
+        self.connection = smtplib.SMTP()
+        self.last_used = time.monotonic()
+        self.messages = 0
+
+        server = tk.config.get("smtp.server", "localhost")
+        user = tk.config.get("smtp.user")
+        password = tk.config.get("smtp.password")
+
+        self.connection.connect(server)
+        self.connection.ehlo()
+        if tk.asbool(tk.config.get("smtp.starttls", False)):
+            if not self.connection.has_extn("STARTTLS"):
+                raise MailerException("SMTP server does not support STARTTLS")
+            self.connection.starttls()
+            self.connection.ehlo()
+
+        if user:
+            assert password, (
+                "If smtp.user is configured then "
+                "smtp.password must be configured as well."
+            )
+            self.connection.login(user, password)
+        _count("connections")
+
+    def is_usable(self) -> bool:
+        if time.monotonic() - self.last_used > config.smtp_max_idle():
+            return False
+        if self.messages >= config.smtp_max_messages():
+            return False
+        try:
+            status, _msg = self.connection.noop()
+        except (smtplib.SMTPException, socket_error):
+            return False
+        return status == 250
+
+    def send(self, recipients: list[str], message: str):
+        start = time.monotonic()
+        try:
+            self.connection.sendmail(tk.config.get("smtp.mail_from"), recipients, message)
+        finally:
+            self.last_used = time.monotonic()
+            self.messages += 1
+            _count("send_seconds", self.last_used - start)
+
+    def close(self):
+        try:
+            self.connection.quit()
+        except (smtplib.SMTPException, socket_error):
+            pass
+
+
+def _session() -> Session:
+    session: Optional[Session] = getattr(_local, "session", None)
+    if session is not None:
+        if session.is_usable():
+            _count("reused")
+            return session
+        session.close()
+
+    _local.session = None
+    _local.session = Session()
+    return _local.session
+
+
+def close():
+    """Close the SMTP connection of the current thread."""
+    session: Optional[Session] = getattr(_local, "session", None)
+    if session is not None:
+        session.close()
+        _local.session = None
+
+
+def send(recipients: list[str], message: str):
+    """Send one email, raising MailerException on failure."""
+    error = send_many([(recipients, message)])[0]
+    if error is not None:
+        raise error
+
+
+def send_many(
+    messages: Iterable[tuple[list[str], str]]
+) -> list[Optional[MailerException]]:
+    """Send emails over a shared connection.
+
+    Returns an error or None for every message. A dropped connection is
+    re-opened once per message.
+    """
+    results: list[Optional[MailerException]] = []
+    for recipients, message in messages:
+        results.append(_send_with_retry(recipients, message))
+    return results
+
+
+def _send_with_retry(recipients: list[str], message: str) -> Optional[MailerException]:
+    for attempt in range(2):
+        try:
+            _session().send(recipients, message)
+        except smtplib.SMTPServerDisconnected as e:
+            close()
+            if attempt:
+                return _failed(e)
+        except MailerException as e:
+            close()
+            return _failed(e)
+        except (smtplib.SMTPException, AttributeError, socket_error) as e:
+            if isinstance(e, (smtplib.SMTPConnectError, socket_error)):
+                close()
+            return _failed(e)
+        else:
+            _count("sent")
+            return None
+    return None
+
+
+def _failed(error: Any) -> MailerException:
+    log.error("Cannot send email: %r", error)
+    _count("failed")
+    return MailerException("%r" % error)
@@ -0,0 +1,53 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Add comments_user_roles table
+
+Revision ID: 3f6d2a8b9c17
+Revises: 8e3b0f6a4c21
+Create Date: 2026-10-18 13:02:51.406113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3f6d2a8b9c17"
+down_revision = "8e3b0f6a4c21"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "comments_user_roles",
+        sa.Column("user_id", sa.Text, primary_key=True),
+        sa.Column("role", sa.Text, primary_key=True),
+        sa.Column("changed", sa.Integer, nullable=False, server_default="0"),
+        sa.Column(
+            "synced_at",
+            sa.DateTime,
+            nullable=False,
+            server_default=sa.func.current_timestamp(),
+        ),
+        sa.Index("ix_comments_user_roles_changed", "changed"),
+    )
+
+
+def downgrade():
+    op.drop_table("comments_user_roles")
@@ -0,0 +1,73 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Add counters to comments_threads table
+
+Revision ID: 5c1e7a9d2b40
+Revises: 9890f1c92bec
+Create Date: 2026-10-18 10:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5c1e7a9d2b40"
+down_revision = "9890f1c92bec"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for column in ["comment_count", "approved_count", "draft_count"]:
+        op.add_column(
+            "comments_threads",
+            sa.Column(column, sa.Integer, nullable=False, server_default="0"),
+        )
+    op.add_column(
+        "comments_threads",
+        sa.Column("last_comment_at", sa.DateTime, nullable=True),
+    )
+
+    op.execute(
+        """
+        UPDATE comments_threads t SET
+            comment_count = c.comment_count,
+            approved_count = c.approved_count,
+            draft_count = c.draft_count,
+            last_comment_at = c.last_comment_at
+        FROM (
+            SELECT
+                thread_id,
+                count(*) AS comment_count,
+                count(*) FILTER (WHERE state = 'approved') AS approved_count,
+                count(*) FILTER (WHERE state = 'draft') AS draft_count,
+                max(created_at) AS last_comment_at
+            FROM comments_comments
+            GROUP BY thread_id
+        ) c
+        WHERE c.thread_id = t.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_column("comments_threads", "last_comment_at")
+    op.drop_column("comments_threads", "draft_count")
+    op.drop_column("comments_threads", "approved_count")
+    op.drop_column("comments_threads", "comment_count")
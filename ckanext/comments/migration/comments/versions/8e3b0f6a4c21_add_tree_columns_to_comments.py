@@ -0,0 +1,88 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Add root_id, depth and path columns to comments_comments table
+
+Revision ID: 8e3b0f6a4c21
+Revises: 5c1e7a9d2b40
+Create Date: 2026-10-18 11:40:07.118254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8e3b0f6a4c21"
+down_revision = "5c1e7a9d2b40"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("comments_comments", sa.Column("root_id", sa.Text, nullable=True))
+    op.add_column(
+        "comments_comments",
+        sa.Column("depth", sa.Integer, nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "comments_comments",
+        sa.Column("path", sa.Text(collation="C"), nullable=True),
+    )
+
+    op.execute(
+        """
+        WITH RECURSIVE tree AS (
+            SELECT
+                id,
+                id AS root_id,
+                0 AS depth,
+                to_char(created_at, 'YYYYMMDDHH24MISSUS') || '.' || id AS path
+            FROM comments_comments
+            WHERE reply_to_id IS NULL
+        UNION ALL
+            SELECT
+                c.id,
+                t.root_id,
+                t.depth + 1,
+                t.path || '/' || to_char(c.created_at, 'YYYYMMDDHH24MISSUS') || '.' || c.id
+            FROM comments_comments c
+            JOIN tree t ON c.reply_to_id = t.id
+        )
+        UPDATE comments_comments c SET
+            root_id = tree.root_id,
+            depth = tree.depth,
+            path = tree.path
+        FROM tree
+        WHERE tree.id = c.id
+        """
+    )
+
+    op.create_index(
+        "ix_comments_comments_root_id", "comments_comments", ["root_id"]
+    )
+    op.create_index(
+        "comments_thread_path_idx", "comments_comments", ["thread_id", "path"]
+    )
+
+
+def downgrade():
+    op.drop_index("comments_thread_path_idx", "comments_comments")
+    op.drop_index("ix_comments_comments_root_id", "comments_comments")
+    op.drop_column("comments_comments", "path")
+    op.drop_column("comments_comments", "depth")
+    op.drop_column("comments_comments", "root_id")
@@ -0,0 +1,68 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Add comments_email_outbox table
+
+Revision ID: b71c4e05d9a3
+Revises: 3f6d2a8b9c17
+Create Date: 2026-10-18 14:21:37.550918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision = "b71c4e05d9a3"
+down_revision = "3f6d2a8b9c17"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "comments_email_outbox",
+        sa.Column("id", sa.Text, primary_key=True),
+        sa.Column("recipients", JSONB, nullable=False),
+        sa.Column("message", sa.Text, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime,
+            nullable=False,
+            server_default=sa.func.current_timestamp(),
+        ),
+        sa.Column(
+            "next_attempt_at",
+            sa.DateTime,
+            nullable=False,
+            server_default=sa.func.current_timestamp(),
+        ),
+        sa.Column("attempts", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("last_error", sa.Text, nullable=True),
+        sa.Column("sent_at", sa.DateTime, nullable=True),
+    )
+    op.create_index(
+        "comments_email_outbox_pending_idx",
+        "comments_email_outbox",
+        ["next_attempt_at"],
+        postgresql_where=sa.text("sent_at IS NULL"),
+    )
+
+
+def downgrade():
+    op.drop_table("comments_email_outbox")
@@ -0,0 +1,58 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Add comments_pending_notifications table
+
+Revision ID: e4a8d1f6b2c5
+Revises: b71c4e05d9a3
+Create Date: 2026-10-18 15:08:12.734209
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e4a8d1f6b2c5"
+down_revision = "b71c4e05d9a3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "comments_pending_notifications",
+        sa.Column("id", sa.Text, primary_key=True),
+        sa.Column(
+            "comment_id",
+            sa.Text,
+            sa.ForeignKey("comments_comments.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("organization_id", sa.Text, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime,
+            nullable=False,
+            server_default=sa.func.current_timestamp(),
+        ),
+        sa.Index("ix_comments_pending_notifications_organization_id", "organization_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("comments_pending_notifications")
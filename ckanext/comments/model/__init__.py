@@ -18,5 +18,8 @@
 from .thread import Thread
 from .comment import Comment
 from .blocked_entity import BlockedEntity
+from .user_role import UserRole
+from .email_outbox import EmailOutbox
+from .pending_notification import PendingNotification
 
-__all__ = ["Thread", "Comment", 'BlockedEntity']
+__all__ = ["Thread", "Comment", 'BlockedEntity', "UserRole", "EmailOutbox", "PendingNotification"]
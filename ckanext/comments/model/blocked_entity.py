@@ -28,17 +28,13 @@ from typing import (
     cast,
     overload,
 )
-from werkzeug.utils import import_string
 
 from sqlalchemy import Column, DateTime, Text
 from sqlalchemy.orm import Query
 
 import ckan.model as model
-import ckan.plugins.toolkit as tk
 from ckan.model.types import make_uuid
 
-from ckanext.comments.exceptions import UnsupportedSubjectType
-
 from .base import Base
 
 log = logging.getLogger(__name__)
@@ -49,12 +45,6 @@ SubjectGetter = Callable[[str], Optional[Subject]]
 
 class BlockedEntity(Base):
     __tablename__ = "comments_blocked_entities"
-    _subject_getters: dict[str, SubjectGetter] = {
-        "package": model.Package.get,
-        "resource": model.Resource.get,
-        "user": model.User.get,
-        "group": model.Group.get,
-    }
 
     id = Column(Text, primary_key=True, default=make_uuid)
     subject_id = Column(Text, nullable=False)
@@ -69,15 +59,9 @@ class BlockedEntity(Base):
 
     @classmethod
     def locate_subject(cls, subject_type: str, subject_id: Any):
-        option = tk.config.get(f"ckanext.comments.subject.{subject_type}_getter")
-        getter = import_string(option, True) if option else None
-        if not getter and subject_type in cls._subject_getters:
-            getter = cls._subject_getters[subject_type]
-
-        if not getter:
-            raise UnsupportedSubjectType(subject_type)
+        from ckanext.comments.subject import locate
 
-        return getter(subject_id)
+        return locate(subject_type, subject_id)
 
     @classmethod
     def for_subject(
@@ -85,12 +69,8 @@ class BlockedEntity(Base):
     ) -> Optional[BlockedEntity]:
         if subject := cls.locate_subject(type_, id_):
             id_ = str(subject.id)
-        log.info(f'id_ = {id_}')
-        blocked_entity = (
+        return (
             model.Session.query(cls)
             .filter(cls.subject_type == type_, cls.subject_id == id_)
             .one_or_none()
         )
-
-        log.info(f'blocked_entity = {blocked_entity}')
-        return blocked_entity
@@ -19,9 +19,10 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Iterable, Optional
 
-from sqlalchemy import Column, DateTime, ForeignKey, Text, BOOLEAN
+import sqlalchemy as sa
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, Text, BOOLEAN
 from sqlalchemy.dialects.postgresql import JSONB
 
 from sqlalchemy.orm import foreign, relationship
@@ -40,6 +41,8 @@ log = logging.getLogger(__name__)
 Author = model.User
 AuthorGetter = Callable[[str], Optional[Author]]
 
+CONTEXT_CACHE_KEY = "comments_loaded_comments"
+
 
 class Comment(Base):
     __tablename__ = "comments_comments"
@@ -62,6 +65,13 @@ class Comment(Base):
 
     reply_to_id = Column(Text, ForeignKey(id), nullable=True, index=True)
 
+    # position in the tree of replies. `path` consists of `created_at.id`
+    # segments of all the ancestors, so ordering by it produces depth-first
+    # traversal of the tree with replies sorted from oldest to newest.
+    root_id = Column(Text, nullable=True, index=True)
+    depth = Column(Integer, nullable=False, default=0)
+    path = Column(Text(collation="C"), nullable=True)
+
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     modified_at = Column(DateTime, nullable=True)
 
@@ -98,6 +108,25 @@ class Comment(Base):
             ")"
         )
 
+    @classmethod
+    def for_context(cls, context: Any, id_: str) -> Optional[Comment]:
+        """Comment loaded at most once per action context.
+
+        Auth functions, validators and actions of the same call share the
+        context, so the object fetched by the first of them is reused by the
+        rest.
+        """
+        loaded = context.setdefault(CONTEXT_CACHE_KEY, {})
+        if id_ not in loaded:
+            session = context.get("session", model.Session)
+            loaded[id_] = session.query(cls).filter(cls.id == id_).one_or_none()
+        return loaded[id_]
+
+    @classmethod
+    def forget_context(cls, context: Any):
+        """Drop comments cached by `for_context`."""
+        context.pop(CONTEXT_CACHE_KEY, None)
+
     @classmethod
     def by_thread(cls, thread_id: str):
         return (
@@ -106,12 +135,101 @@ class Comment(Base):
             .order_by(cls.created_at)
         )
 
+    def place_under(self, parent: Optional[Comment]) -> None:
+        """Fill tree columns of the comment.
+
+        Comment must have `id` and `created_at` before it's placed.
+        """
+        for column, value in self.tree_columns(self.id, self.created_at, parent).items():
+            setattr(self, column, value)
+
+    @staticmethod
+    def tree_columns(id_: str, created_at: datetime, parent: Any) -> dict[str, Any]:
+        """Values of `root_id`, `depth` and `path` of the comment.
+
+        Parent is anything with `root_id`, `depth` and `path` attributes.
+        """
+        segment = f"{created_at:%Y%m%d%H%M%S%f}.{id_}"
+        if parent is None:
+            return {"root_id": id_, "depth": 0, "path": segment}
+        return {
+            "root_id": parent.root_id,
+            "depth": parent.depth + 1,
+            "path": f"{parent.path}/{segment}",
+        }
+
+    def subtree(self, max_depth: Optional[int] = None):
+        """All the replies to the comment, in the tree order."""
+        query = (
+            model.Session.query(Comment)
+            .filter(
+                Comment.root_id == self.root_id,
+                Comment.path.startswith(f"{self.path}/", autoescape=True),
+            )
+            .order_by(Comment.path)
+        )
+        if max_depth is not None:
+            query = query.filter(Comment.depth <= max_depth)
+        return query
+
+    @classmethod
+    def latest_by_thread(
+        cls, thread_ids: Iterable[str], limit: int
+    ) -> dict[str, list[Comment]]:
+        """Up to `limit` newest approved comments of every thread.
+
+        All threads are processed by a single query that ranks comments with
+        a window function.
+        """
+        ids = list(set(thread_ids))
+        if not ids:
+            return {}
+
+        rank = (
+            sa.func.row_number()
+            .over(
+                partition_by=cls.thread_id,
+                order_by=(cls.created_at.desc(), cls.id.desc()),
+            )
+            .label("rank")
+        )
+        ranked = (
+            model.Session.query(cls.id.label("id"), rank)
+            .filter(cls.thread_id.in_(ids), cls.state == cls.State.approved)
+            .subquery()
+        )
+        query = (
+            model.Session.query(cls)
+            .join(ranked, ranked.c.id == cls.id)
+            .filter(ranked.c.rank <= limit)
+            .order_by(cls.thread_id, ranked.c.rank)
+        )
+
+        comments: dict[str, list[Comment]] = {}
+        for comment in query:
+            comments.setdefault(comment.thread_id, []).append(comment)
+        return comments
+
     def approve(self) -> None:
         self.state = self.State.approved
     
     def draft(self) -> None:
         self.state = self.State.draft
 
+    def change_state(self, state: str) -> bool:
+        """Store the new state of the comment.
+
+        The state is changed by a conditional UPDATE, so when concurrent
+        requests change the same comment, only one of them succeeds.
+        Returns True if the stored state was actually changed.
+        """
+        changed = (
+            model.Session.query(Comment)
+            .filter(Comment.id == self.id, Comment.state != state)
+            .update({Comment.state: state}, synchronize_session="evaluate")
+        )
+        return changed == 1
+
     def is_approved(self) -> bool:
         return self.state == self.State.approved
 
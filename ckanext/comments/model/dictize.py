@@ -19,9 +19,10 @@ from __future__ import annotations
 
 import logging
 from collections import defaultdict
+from datetime import datetime
 from typing import TYPE_CHECKING, Any, Callable, Optional, cast
 
-from sqlalchemy.orm import joinedload
+import sqlalchemy as sa
 
 import ckan.lib.dictization as d
 import ckan.lib.dictization.model_dictize as md
@@ -30,7 +31,13 @@ import ckan.plugins.toolkit as tk
 
 from ckanext.comments.model import Comment, Thread, BlockedEntity
 
-from ..utils import is_moderator
+from ..utils import (
+    author_label,
+    decode_cursor,
+    encode_cursor,
+    get_author_labels,
+    is_moderator,
+)
 
 if TYPE_CHECKING:
     from typing import TypedDict
@@ -41,6 +48,9 @@ if TYPE_CHECKING:
         replies: Optional[list[CommentDict]]
 
 
+AUTHOR_FIELDS = ("id", "name", "fullname", "image_url", "state", "sysadmin", "created")
+"""User columns that can be requested via `author_fields`."""
+
 _dictizers: dict[type, Callable[..., dict[str, Any]]] = defaultdict(
     lambda: d.table_dictize
 )
@@ -56,58 +66,288 @@ def register_dictizer(type_: type, func: Any):
     _dictizers[type_] = func
 
 
-def combine_comments(comments: list["CommentDict"]):
+def combine_comments(
+    comments: list["CommentDict"],
+    newest_first: bool = False,
+    replies_newest_first: bool = False,
+):
+    """Build the tree of comments in the display order.
+
+    Comments are sorted once by `(created_at, id)`, so every level of the tree
+    is in chronological order after the grouping. Top-level comments and
+    replies are then reversed according to the requested order.
+    """
     replies: dict[Optional[str], list["CommentDict"]] = {None: []}
-    for comment in comments:
+    for comment in sorted(comments, key=lambda c: (c["created_at"], c["id"])):
         comment["replies"] = replies.setdefault(comment["id"], [])
         reply_to = comment["reply_to_id"]
         replies.setdefault(reply_to, []).append(comment)
-    return replies[None]
+
+    top = replies.pop(None)
+    if newest_first:
+        top.reverse()
+    if replies_newest_first:
+        for level in replies.values():
+            level.reverse()
+
+    return top
+
+
+def attach_reply_previews(
+    comments: list[dict[str, Any]],
+    parents: Optional[dict[str, dict[str, Any]]] = None,
+):
+    """Add the content and author label of the parent to every reply.
+
+    Parents are looked up among the given comments and in the optional
+    `parents` mapping of ID to `content`/`author_label`, used for parents that
+    are visible but not part of the list. If the parent is not found (i.e.,
+    it is hidden from the current user), preview fields are set to None.
+    """
+    index = dict(parents or {})
+    index.update((c["id"], c) for c in comments)
+    for comment in comments:
+        if not comment["reply_to_id"]:
+            continue
+        parent = index.get(comment["reply_to_id"])
+        comment["reply_to_content"] = parent["content"] if parent else None
+        comment["reply_to_author_label"] = (
+            parent.get("author_label") if parent else None
+        )
+
+
+def paginate_comments(
+    query: Any,
+    limit: int,
+    cursor: Optional[str],
+    newest_first: bool,
+    include_replies: bool = True,
+    parent_id: Optional[str] = None,
+) -> tuple[list[Comment], Optional[str]]:
+    """Fetch a page of comments together with all their replies.
+
+    Comments are taken from the top level of the thread, or from the direct
+    replies to `parent_id`. Nested replies are loaded only when
+    `include_replies` is enabled.
+
+    Pages are built with keyset pagination over `(created_at, id)`, so the
+    cost of a page does not depend on its position in the thread. Replies are
+    selected by the stored position in the tree of comments.
+    """
+    key = sa.tuple_(Comment.created_at, Comment.id)
+    top = query.filter(Comment.reply_to_id == parent_id).order_by(None)
+    if newest_first:
+        top = top.order_by(Comment.created_at.desc(), Comment.id.desc())
+    else:
+        top = top.order_by(Comment.created_at, Comment.id)
+
+    if cursor:
+        position = sa.tuple_(*decode_cursor(cursor))
+        top = top.filter(key < position if newest_first else key > position)
+
+    page = top.limit(limit + 1).all()
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        last = page[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    if not page or not include_replies:
+        return page, next_cursor
+
+    if parent_id is None:
+        descendants = sa.and_(
+            Comment.root_id.in_([c.id for c in page]),
+            Comment.reply_to_id.isnot(None),
+        )
+    else:
+        descendants = sa.or_(
+            *[Comment.path.startswith(f"{c.path}/", autoescape=True) for c in page]
+        )
+    replies = query.filter(descendants).all()
+
+    return page + replies, next_cursor
+
+
+def visible_comments(query: Any, thread: Thread, context: Any) -> Any:
+    """Restrict the query to comments the current user is allowed to see."""
+    approved_filter = Comment.state == Comment.State.approved
+    user = model.User.get(context["user"])
+
+    if context.get("ignore_auth"):
+        pass
+    elif user is None:
+        query = query.filter(approved_filter)
+    elif not is_moderator(user, None, thread):
+        query = query.filter(approved_filter)
+
+    after_date = context.get("after_date")
+    if after_date:
+        date_filer = Comment.created_at >= after_date
+        query = query.filter(date_filer)
+
+    return query
+
+
+def attach_reply_counts(comments: list[dict[str, Any]], query: Any):
+    """Add the number of direct replies to every comment.
+
+    `query` must select visible comments of the thread, so that hidden replies
+    are not counted.
+    """
+    if not comments:
+        return
+
+    counts = dict(
+        query.order_by(None)
+        .with_entities(Comment.reply_to_id, sa.func.count(Comment.id))
+        .filter(Comment.reply_to_id.in_([c["id"] for c in comments]))
+        .group_by(Comment.reply_to_id)
+    )
+    for comment in comments:
+        comment["reply_count"] = counts.get(comment["id"], 0)
+
+
+def dictize_comments(
+    comments: list[Comment],
+    context: Any,
+    parents: Optional[list[Comment]] = None,
+) -> list[dict[str, Any]]:
+    """Dictize comments of the same thread, resolving shared data in bulk.
+
+    `parents` are comments outside of the list that replies may reference.
+    They are not dictized, only used for reply previews.
+    """
+    parents = parents or []
+    include_author = tk.asbool(context.get("include_author"))
+    authors = load_authors(comments, context) if include_author else {}
+
+    comments_dictized = []
+    for comment in comments:
+        assert isinstance(comment, Comment)
+        extra = {}
+        if include_author:
+            extra["author"] = authors.get(cast(str, comment.author_id))
+            if extra["author"] is None:
+                log.error("Missing author for comment: %s", comment)
+        dictized = comment_dictize(comment, context, **extra)
+        comments_dictized.append(dictized)
+
+    previews = {
+        p.id: {
+            "content": p.content,
+            "author_id": p.author_id,
+            "username": p.username,
+        }
+        for p in parents
+    }
+
+    if context.get("include_author_label"):
+        labels = get_author_labels(
+            [c["author_id"] for c in comments_dictized]
+            + [p["author_id"] for p in previews.values()]
+        )
+        for dictized in comments_dictized:
+            dictized["author_label"] = author_label(dictized, labels)
+        for preview in previews.values():
+            preview["author_label"] = author_label(preview, labels)
+
+    capabilities = context.get("capabilities")
+    if capabilities is not None:
+        for dictized in comments_dictized:
+            dictized.update(capabilities(dictized))
+
+    attach_reply_previews(comments_dictized, previews)
+    return comments_dictized
 
 
 def thread_dictize(obj: Thread, context: Any) -> dict[str, Any]:
     comments_dictized = None
+    extra: dict[str, Any] = {}
 
     if context.get("include_comments"):
         query = Comment.by_thread(cast(str, obj.id))
         if context.get("newest_first"):
             query = query.order_by(None).order_by(Comment.created_at.desc())
 
-        include_author = tk.asbool(context.get("include_author"))
-        after_date = context.get("after_date")
-
-        if include_author:
-            query = query.options(joinedload(Comment.user))
-
-        approved_filter = Comment.state == Comment.State.approved
-        user = model.User.get(context["user"])
-
-        if context.get("ignore_auth"):
-            pass
-        elif user is None:
-            query = query.filter(approved_filter)
-        elif not is_moderator(user, None, obj):
-            query = query.filter(approved_filter)
-
-        if after_date:
-            date_filer = Comment.created_at >= after_date
-            query = query.filter(date_filer)
+        query = visible_comments(query, obj, context)
+        max_depth = context.get("max_depth")
+        if max_depth is not None:
+            query = query.filter(Comment.depth <= max_depth)
+
+        include_replies = tk.asbool(context.get("include_replies", True))
+
+        limit = context.get("limit")
+        if limit:
+            comments, extra["next_cursor"] = paginate_comments(
+                query,
+                limit,
+                context.get("cursor"),
+                tk.asbool(context.get("newest_first")),
+                include_replies,
+            )
+        elif include_replies:
+            comments = query.all()
+        else:
+            comments = query.filter(Comment.reply_to_id.is_(None)).all()
 
-        comments_dictized = []
+        comments_dictized = dictize_comments(comments, context)
+        if not include_replies:
+            attach_reply_counts(comments_dictized, query)
 
-        for comment in query:
-            assert isinstance(comment, Comment)
-            dictized = comment_dictize(comment, context)
-            comments_dictized.append(dictized)
         if context.get("combine_comments"):
-            comments_dictized = combine_comments(comments_dictized)
-    return d.table_dictize(obj, context, comments=comments_dictized)
+            comments_dictized = combine_comments(
+                comments_dictized,
+                tk.asbool(context.get("newest_first")),
+                tk.asbool(context.get("replies_newest_first")),
+            )
+    return d.table_dictize(obj, context, comments=comments_dictized, **extra)
+
+
+def load_authors(comments: list[Comment], context: Any) -> dict[str, Any]:
+    """Dictize the authors of the comments, fetching all of them at once.
+
+    Every distinct author is dictized only once and the result is shared by
+    all the comments that reference it, either by user ID or by username.
+
+    When `author_fields` is set in the context, only those columns are
+    selected and no ORM objects are built.
+    """
+    ids = {c.author_id for c in comments if c.author_type == "user"}
+    if not ids:
+        return {}
+
+    author_filter = sa.or_(model.User.id.in_(ids), model.User.name.in_(ids))
+    fields = context.get("author_fields")
+
+    authors: dict[str, Any] = {}
+    if fields:
+        columns = {"id", "name", *fields}
+        rows = model.Session.query(
+            *[getattr(model.User, column) for column in columns]
+        ).filter(author_filter)
+
+        for row in rows:
+            author = {}
+            for field in fields:
+                value = getattr(row, field)
+                if isinstance(value, datetime):
+                    value = value.isoformat()
+                author[field] = value
+            authors[row.id] = authors[row.name] = author
+        return authors
+
+    users = model.Session.query(model.User).filter(author_filter)
+    dictizer = get_dictizer(model.User)
+    for user in users:
+        authors[user.id] = authors[user.name] = dictizer(user, context.copy())
+    return authors
 
 
 def comment_dictize(obj: Comment, context: Any, **extra: Any) -> dict[str, Any]:
     extra["approved"] = obj.is_approved()
 
-    if context.get("include_author"):
+    if context.get("include_author") and "author" not in extra:
         author = obj.get_author()
         if author:
             extra["author"] = get_dictizer(type(author))(author, context.copy())
@@ -0,0 +1,68 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Integer, Text
+from sqlalchemy.dialects.postgresql import JSONB
+
+import ckan.model as model
+from ckan.model.types import make_uuid
+
+from .base import Base
+
+
+class EmailOutbox(Base):
+    """Email waiting for delivery.
+
+    Messages are stored in the same transaction as the change that triggered
+    them and delivered later by `ckanext.comments.outbox`.
+    """
+
+    __tablename__ = "comments_email_outbox"
+
+    id = Column(Text, primary_key=True, default=make_uuid)
+    recipients = Column(JSONB, nullable=False)
+    message = Column(Text, nullable=False)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return (
+            f"EmailOutbox(id={self.id!r}, attempts={self.attempts!r},"
+            f" sent_at={self.sent_at!r})"
+        )
+
+    @classmethod
+    def pending(cls, max_attempts: int, now: Optional[datetime] = None):
+        """Unsent messages that are due, oldest first."""
+        now = now or datetime.utcnow()
+        return (
+            model.Session.query(cls)
+            .filter(
+                cls.sent_at.is_(None),
+                cls.attempts < max_attempts,
+                cls.next_attempt_at <= now,
+            )
+            .order_by(cls.next_attempt_at)
+        )
@@ -0,0 +1,46 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Text
+
+from ckan.model.types import make_uuid
+
+from .base import Base
+from .comment import Comment
+
+
+class PendingNotification(Base):
+    """Comment waiting to be included into the digest of the organization."""
+
+    __tablename__ = "comments_pending_notifications"
+
+    id = Column(Text, primary_key=True, default=make_uuid)
+    comment_id = Column(
+        Text, ForeignKey(Comment.id, ondelete="CASCADE"), nullable=False
+    )
+    organization_id = Column(Text, nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return (
+            f"PendingNotification(comment_id={self.comment_id!r},"
+            f" organization_id={self.organization_id!r})"
+        )
@@ -22,23 +22,22 @@ from datetime import datetime
 from typing import (
     Any,
     Callable,
+    Iterable,
     Literal,
     Optional,
     Union,
     cast,
     overload,
 )
-from werkzeug.utils import import_string
 
-from sqlalchemy import Column, DateTime, Text
+import sqlalchemy as sa
+from sqlalchemy import Column, DateTime, Integer, Text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Query
 
 import ckan.model as model
-import ckan.plugins.toolkit as tk
 from ckan.model.types import make_uuid
 
-from ckanext.comments.exceptions import UnsupportedSubjectType
-
 from .base import Base
 
 log = logging.getLogger(__name__)
@@ -49,12 +48,6 @@ SubjectGetter = Callable[[str], Optional[Subject]]
 
 class Thread(Base):
     __tablename__ = "comments_threads"
-    _subject_getters: dict[str, SubjectGetter] = {
-        "package": model.Package.get,
-        "resource": model.Resource.get,
-        "user": model.User.get,
-        "group": model.Group.get,
-    }
 
     id = Column(Text, primary_key=True, default=make_uuid)
     subject_id = Column(Text, nullable=False)
@@ -62,6 +55,11 @@ class Thread(Base):
 
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
+    comment_count = Column(Integer, nullable=False, default=0)
+    approved_count = Column(Integer, nullable=False, default=0)
+    draft_count = Column(Integer, nullable=False, default=0)
+    last_comment_at = Column(DateTime, nullable=True)
+
     def __repr__(self):
         return "Thread(" f"id={self.id!r}, " f"subject_type={self.subject_type!r}, " ")"
 
@@ -70,20 +68,65 @@ class Thread(Base):
 
         return Comment.by_thread(cast(str, self.id))
 
+    @classmethod
+    def update_counters(
+        cls,
+        id_: str,
+        approved: int = 0,
+        draft: int = 0,
+        last_comment_at: Optional[datetime] = None,
+    ) -> None:
+        """Shift counters of the thread by the given deltas.
+
+        Changes are applied by a single UPDATE statement, so concurrent
+        requests never overwrite each other's increments.
+        """
+        values: dict[Any, Any] = {
+            cls.comment_count: cls.comment_count + approved + draft,
+            cls.approved_count: cls.approved_count + approved,
+            cls.draft_count: cls.draft_count + draft,
+        }
+        if last_comment_at:
+            values[cls.last_comment_at] = sa.func.greatest(
+                sa.func.coalesce(cls.last_comment_at, last_comment_at),
+                last_comment_at,
+            )
+        model.Session.query(cls).filter(cls.id == id_).update(
+            values, synchronize_session=False
+        )
+
+    @classmethod
+    def refresh_counters(cls, id_: str) -> None:
+        """Recalculate counters of the thread from its comments."""
+        from .comment import Comment
+
+        def count(*filters: Any):
+            return (
+                sa.select([sa.func.count(Comment.id)])
+                .where(sa.and_(Comment.thread_id == cls.id, *filters))
+                .as_scalar()
+            )
+
+        model.Session.query(cls).filter(cls.id == id_).update(
+            {
+                cls.comment_count: count(),
+                cls.approved_count: count(Comment.state == Comment.State.approved),
+                cls.draft_count: count(Comment.state == Comment.State.draft),
+                cls.last_comment_at: sa.select([sa.func.max(Comment.created_at)])
+                .where(Comment.thread_id == cls.id)
+                .as_scalar(),
+            },
+            synchronize_session=False,
+        )
+
     def get_subject(self) -> Optional[Subject]:
         return self.locate_subject(cast(str, self.subject_type), self.subject_id)
 
     @classmethod
     def locate_subject(cls, subject_type: str, subject_id: Any):
-        option = tk.config.get(f"ckanext.comments.subject.{subject_type}_getter")
-        getter = import_string(option, True) if option else None
-        if not getter and subject_type in cls._subject_getters:
-            getter = cls._subject_getters[subject_type]
-
-        if not getter:
-            raise UnsupportedSubjectType(subject_type)
+        from ckanext.comments.subject import locate
 
-        return getter(subject_id)
+        return locate(subject_type, subject_id)
 
     @overload
     @classmethod
@@ -113,3 +156,50 @@ class Thread(Base):
         if thread is None and init_missing:
             thread = cls(subject_type=type_, subject_id=id_)
         return thread
+
+    @classmethod
+    def upsert(cls, type_: str, id_: str) -> str:
+        """ID of the subject's thread, created when missing.
+
+        The thread is inserted with `ON CONFLICT DO NOTHING` on the unique
+        subject index, so concurrent requests never fail on the duplicate;
+        the loser of the race reads the ID of the existing thread. Session
+        is not committed. ID must be the canonical ID of the subject.
+        """
+        stmt = (
+            insert(cls.__table__)
+            .values(
+                id=make_uuid(),
+                subject_type=type_,
+                subject_id=id_,
+                created_at=datetime.utcnow(),
+            )
+            .on_conflict_do_nothing(index_elements=["subject_id", "subject_type"])
+            .returning(cls.id)
+        )
+        thread_id = model.Session.execute(stmt).scalar()
+        if thread_id is None:
+            thread_id = (
+                model.Session.query(cls.id)
+                .filter(cls.subject_type == type_, cls.subject_id == id_)
+                .scalar()
+            )
+        return thread_id
+
+    @classmethod
+    def for_subjects(
+        cls, subjects: Iterable[tuple[str, str]]
+    ) -> dict[tuple[str, str], Thread]:
+        """Existing threads of the subjects, fetched with a single query.
+
+        Subjects are identified by `(type, id)` pairs, where ID must be the
+        canonical ID of the subject.
+        """
+        pairs = list(set(subjects))
+        if not pairs:
+            return {}
+
+        threads = model.Session.query(cls).filter(
+            sa.tuple_(cls.subject_type, cls.subject_id).in_(pairs)
+        )
+        return {(t.subject_type, t.subject_id): t for t in threads}
@@ -0,0 +1,91 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Iterable, Mapping
+
+import sqlalchemy as sa
+from sqlalchemy import Column, DateTime, Integer, Text
+
+import ckan.model as model
+
+from .base import Base
+
+
+class UserRole(Base):
+    """Local copy of the Drupal roles of CKAN users."""
+
+    __tablename__ = "comments_user_roles"
+
+    user_id = Column(Text, primary_key=True)
+    role = Column(Text, primary_key=True)
+    # `changed` timestamp of the Drupal user at the moment of the sync
+    changed = Column(Integer, nullable=False, default=0, index=True)
+    synced_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"UserRole(user_id={self.user_id!r}, role={self.role!r})"
+
+    @classmethod
+    def by_users(cls, user_ids: Iterable[str]) -> dict[str, tuple[str, ...]]:
+        ids = {str(id_) for id_ in user_ids if id_}
+        roles: dict[str, list[str]] = {id_: [] for id_ in ids}
+        if ids:
+            query = model.Session.query(cls.user_id, cls.role).filter(
+                cls.user_id.in_(ids)
+            )
+            for user_id, role in query:
+                roles[user_id].append(role)
+        return {id_: tuple(user_roles) for id_, user_roles in roles.items()}
+
+    @classmethod
+    def last_change(cls) -> int:
+        """Newest Drupal change that was synced."""
+        return model.Session.query(sa.func.max(cls.changed)).scalar() or 0
+
+    @classmethod
+    def replace(
+        cls,
+        roles: Mapping[str, Iterable[str]],
+        changed: Mapping[str, int],
+    ):
+        """Replace roles of the given users. Session is not committed."""
+        if not roles:
+            return
+
+        model.Session.query(cls).filter(cls.user_id.in_(list(roles))).delete(
+            synchronize_session=False
+        )
+        now = datetime.utcnow()
+        model.Session.bulk_insert_mappings(
+            cls,
+            [
+                {
+                    "user_id": user_id,
+                    "role": role,
+                    "changed": changed.get(user_id, 0),
+                    "synced_at": now,
+                }
+                for user_id, user_roles in roles.items()
+                for role in set(user_roles)
+            ],
+        )
+
+    @classmethod
+    def clear(cls):
+        model.Session.query(cls).delete(synchronize_session=False)
@@ -0,0 +1,140 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Durable queue of notification emails.
+
+Emails are added to the `comments_email_outbox` table inside the transaction
+of the action that produced them, so they are stored only if the change is
+committed. Messages are sent later by `deliver_pending`, either from a
+background job enqueued after the action or from `ckan comments send-emails`.
+Failed messages are retried with exponential backoff.
+
+In `direct` mode messages are kept in memory until the action commits and
+are sent by `schedule_delivery`; emails of a rolled back transaction are
+dropped.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+from email.message import Message
+from typing import Any, Iterable, Union
+
+import sqlalchemy as sa
+
+import ckan.model as model
+import ckan.plugins.toolkit as tk
+
+from . import config, mailer
+from .model import EmailOutbox
+
+log = logging.getLogger(__name__)
+
+Recipients = Union[str, Iterable[str]]
+
+# keys of `Session.info` that describe emails of the current transaction
+STORED_KEY = "comments_outbox_stored"
+DIRECT_KEY = "comments_outbox_direct"
+
+
+def _normalize(recipients: Recipients) -> list[str]:
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    return [r.strip() for r in recipients if r and r.strip()]
+
+
+def enqueue(recipients: Recipients, msg: Message):
+    """Store the email for delivery. Session is not committed."""
+    addressees = _normalize(recipients)
+    if not addressees:
+        log.info("Skip sending email. addressees (%s) aren't correct", recipients)
+        return
+
+    info = model.Session().info
+    if config.email_delivery() == "direct":
+        info.setdefault(DIRECT_KEY, []).append((addressees, msg.as_string()))
+        return
+
+    model.Session.add(EmailOutbox(recipients=addressees, message=msg.as_string()))
+    info[STORED_KEY] = True
+
+
+def schedule_delivery():
+    """Deliver emails enqueued by the transaction that was just committed.
+
+    Direct emails are sent right away. Otherwise a background job that sends
+    the stored emails is started, but only when some email was stored.
+    """
+    info = model.Session().info
+    direct = info.pop(DIRECT_KEY, [])
+    stored = info.pop(STORED_KEY, False)
+
+    for (addressees, _message), error in zip(direct, mailer.send_many(direct)):
+        if error is not None:
+            log.error("Cannot send email to %s: %s", addressees, error)
+
+    if not stored or config.email_delivery() != "outbox" or not config.outbox_job():
+        return
+    try:
+        tk.enqueue_job(deliver_pending, title="comments: send emails")
+    except Exception:
+        log.exception("Cannot enqueue delivery of emails")
+
+
+@sa.event.listens_for(model.Session, "after_soft_rollback")
+def _forget_emails(session: Any, previous_transaction: Any):
+    # savepoints are rolled back when a single email cannot be built; the
+    # emails of the main transaction are still valid
+    if previous_transaction.nested:
+        return
+    session.info.pop(DIRECT_KEY, None)
+    session.info.pop(STORED_KEY, None)
+
+
+def deliver_pending(limit: int = 100) -> tuple[int, int]:
+    """Send due emails from the outbox.
+
+    Rows are locked while they are sent, so concurrent workers skip them.
+    Returns the number of sent and failed messages.
+    """
+    now = datetime.utcnow()
+    rows = (
+        EmailOutbox.pending(config.outbox_max_attempts(), now)
+        .with_for_update(skip_locked=True)
+        .limit(limit)
+        .all()
+    )
+
+    errors = mailer.send_many((row.recipients, row.message) for row in rows)
+
+    sent = failed = 0
+    for row, error in zip(rows, errors):
+        row.attempts += 1
+        if error is not None:
+            failed += 1
+            row.last_error = repr(error)
+            delay = config.outbox_retry_delay() * 2 ** (row.attempts - 1)
+            row.next_attempt_at = now + timedelta(seconds=delay)
+            log.warning("Cannot send email %s, attempt %d", row.id, row.attempts)
+        else:
+            sent += 1
+            row.sent_at = datetime.utcnow()
+            row.last_error = None
+
+    model.Session.commit()
+    return sent, failed
@@ -19,10 +19,15 @@ import ckan.plugins as plugins
 import ckan.plugins.toolkit as tk
 from ckan.common import c
 
+import ckanext.comments.cli as cli
+import ckanext.comments.config as comments_config
+import ckanext.comments.emails as emails
 import ckanext.comments.helpers as helpers
 import ckanext.comments.logic.action as action
 import ckanext.comments.logic.auth as auth
 import ckanext.comments.logic.validators as validators
+import ckanext.comments.subject as subject
+from ckanext.comments.model import Thread
 import json
 
 import ckan.model as model
@@ -95,15 +100,55 @@ def getCommentsByPublicadorId():
         response.status_code = 401
         return response
 
+@myextension_blueprint.route('/comments/replies/<id>', methods=['GET'])
+def getReplies(id):
+    context = {"user": tk.g.user, "auth_user_obj": tk.g.userobj or None}
+    try:
+        result = tk.get_action("comments_replies_list")(
+            context,
+            {
+                "id": id,
+                "limit": request.args.get("limit", 20, type=int),
+                "cursor": request.args.get("cursor"),
+                "newest_first": comments_config.replies_newest_first(),
+                "include_author": True,
+                "author_fields": ["id", "name", "fullname"],
+                "include_author_label": True,
+                "include_capabilities": True,
+            },
+        )
+        thread = model.Session.query(Thread).get(result["thread_id"])
+    except tk.ObjectNotFound:
+        return tk.abort(404, tk._("Comment not found"))
+    except tk.NotAuthorized:
+        return tk.abort(403, tk._("Not authorized to see this comment"))
+    except tk.ValidationError as e:
+        return tk.abort(400, str(e.error_summary))
+
+    return tk.render(
+        "comments/snippets/replies.html",
+        {
+            "parent_id": id,
+            "replies": result["replies"],
+            "next_cursor": result["next_cursor"],
+            "subject_id": thread.subject_id,
+            "subject_type": thread.subject_type,
+            "depth": request.args.get("depth", 1, type=int),
+        },
+    )
+
+
 @config_declarations
 class CommentsPlugin(plugins.SingletonPlugin, DefaultTranslation):
     plugins.implements(plugins.IConfigurer)
+    plugins.implements(plugins.IConfigurable)
     plugins.implements(plugins.IAuthFunctions)
     plugins.implements(plugins.IActions)
     plugins.implements(plugins.ITemplateHelpers)
     plugins.implements(plugins.IValidators)
     plugins.implements(plugins.IRoutes, inherit=True)
     plugins.implements(plugins.IBlueprint)
+    plugins.implements(plugins.IClick)
     if is_frontend():
         plugins.implements(plugins.ITranslation, inherit=True)
  
@@ -117,6 +162,12 @@ class CommentsPlugin(plugins.SingletonPlugin, DefaultTranslation):
         tk.add_public_directory(config_, "public")
         tk.add_resource("assets", "comments")
 
+    # IConfigurable
+
+    def configure(self, config_):
+        subject.configure(config_)
+        emails.reset()
+
     # IAuthFunctions
 
     def get_auth_functions(self):
@@ -136,3 +187,8 @@ class CommentsPlugin(plugins.SingletonPlugin, DefaultTranslation):
 
     def get_validators(self):
         return validators.get_validators()
+
+    # IClick
+
+    def get_commands(self):
+        return cli.get_commands()
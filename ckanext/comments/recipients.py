@@ -0,0 +1,135 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Email addresses of the editors notified about comments of an organization.
+
+Active editors of an organization are fetched by a single query and kept in
+memory for `ckanext.comments.recipients.cache_ttl` seconds. The entry of an
+organization is dropped as soon as CKAN reports a change of its members or
+of the organization itself; changes of users, who may belong to any
+organization, clear the whole cache. CKAN 2.9 does not send these signals,
+so there entries only expire.
+
+Other processes may use stale entries until they expire, so the cache only
+builds lists of recipients and is never used for permission checks.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Optional
+
+import ckan.model as model
+
+from . import config
+
+try:
+    from ckan.lib.signals import action_succeeded
+except ImportError:
+    action_succeeded = None
+
+log = logging.getLogger(__name__)
+
+CACHE_SIZE = 1000
+
+MEMBER_ACTIONS = {
+    "member_create",
+    "member_delete",
+    "organization_member_create",
+    "organization_member_delete",
+}
+ORGANIZATION_ACTIONS = {
+    "organization_update",
+    "organization_patch",
+    "organization_delete",
+    "organization_purge",
+}
+USER_ACTIONS = {
+    "user_update",
+    "user_patch",
+    "user_delete",
+}
+
+_cache: Optional[Any] = None
+
+
+def _get_cache() -> Any:
+    global _cache
+    if _cache is None:
+        from .cache import LRUBackend
+
+        _cache = LRUBackend(CACHE_SIZE)
+    return _cache
+
+
+def editor_emails(organization_id: Optional[str]) -> tuple[str, ...]:
+    """Emails of active editors of the organization."""
+    if not organization_id:
+        return ()
+
+    ttl = config.recipients_cache_ttl()
+    cache = _get_cache()
+    emails = cache.get(organization_id) if ttl else None
+    if emails is None:
+        emails = _fetch_editor_emails(organization_id)
+        if ttl:
+            cache.set(organization_id, emails, ttl)
+    return emails
+
+
+def invalidate(organization_id: Optional[str] = None):
+    """Forget editors of the organization, or of all organizations."""
+    cache = _get_cache()
+    if organization_id:
+        cache.delete(organization_id)
+    else:
+        cache.clear()
+
+
+def _fetch_editor_emails(organization_id: str) -> tuple[str, ...]:
+    rows = (
+        model.Session.query(model.User.email)
+        .join(model.Member, model.Member.table_id == model.User.id)
+        .filter(
+            model.Member.group_id == organization_id,
+            model.Member.table_name == "user",
+            model.Member.capacity == "editor",
+            model.Member.state == "active",
+            model.User.state == "active",
+            model.User.email != "",
+            model.User.email.isnot(None),
+        )
+        .order_by(model.User.name)
+    )
+    return tuple(email for (email,) in rows)
+
+
+def _on_action_succeeded(sender: str, **kwargs: Any):
+    result = kwargs.get("result")
+    if not isinstance(result, dict):
+        result = {}
+
+    if sender in MEMBER_ACTIONS:
+        invalidate(result.get("group_id"))
+    elif sender in ORGANIZATION_ACTIONS:
+        invalidate(result.get("id"))
+    elif sender in USER_ACTIONS:
+        invalidate()
+
+
+if action_succeeded is not None:
+    action_succeeded.connect(_on_action_succeeded)
@@ -15,7 +15,33 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+"""Registry of the functions that find commented entities.
+
+Getters are resolved once, when the plugin is configured. Custom getters are
+registered with `ckanext.comments.subject.<subject_type>_getter` options.
+Located subjects are remembered until the end of the request.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from typing import Any, Callable, Mapping, Optional, Union
+
+from werkzeug.utils import import_string
+
 import ckan.model as model
+import ckan.plugins.toolkit as tk
+
+from . import utils
+from .exceptions import UnsupportedSubjectType
+
+log = logging.getLogger(__name__)
+
+Subject = Union[model.Package, model.Resource, model.User, model.Group]
+SubjectGetter = Callable[[str], Optional[Subject]]
+
+GETTER_OPTION = re.compile(r"^ckanext\.comments\.subject\.(?P<type>\w+)_getter$")
 
 
 def package_getter(id: str):
@@ -32,3 +58,65 @@ def user_getter(id: str):
 
 def group_getter(id: str):
     return model.Group.get(id)
+
+
+DEFAULT_GETTERS: dict[str, SubjectGetter] = {
+    "package": package_getter,
+    "resource": resource_getter,
+    "user": user_getter,
+    "group": group_getter,
+}
+
+_getters: Optional[dict[str, SubjectGetter]] = None
+
+
+def configure(config: Mapping[str, Any]):
+    """Build the registry of getters from the CKAN config."""
+    global _getters
+    getters = dict(DEFAULT_GETTERS)
+    for key, value in config.items():
+        match = GETTER_OPTION.match(key)
+        if not match or not value:
+            continue
+        getter = import_string(value, True)
+        if getter is None:
+            log.error("Cannot import subject getter %s from %s", value, key)
+            continue
+        getters[match.group("type")] = getter
+    _getters = getters
+
+
+def reset():
+    global _getters
+    _getters = None
+
+
+def get_getter(subject_type: str) -> SubjectGetter:
+    if _getters is None:
+        configure(tk.config)
+    assert _getters is not None
+
+    if subject_type not in _getters:
+        raise UnsupportedSubjectType(subject_type)
+    return _getters[subject_type]
+
+
+def locate(subject_type: str, subject_id: Any) -> Optional[Subject]:
+    """Find the subject, reusing subjects located during the current request.
+
+    Subject is remembered both by the given ID and by its canonical ID,
+    when it has one.
+    """
+    getter = get_getter(subject_type)
+    memo = utils.request_cache("subjects")
+    key = (subject_type, subject_id)
+    if key in memo:
+        return memo[key]
+
+    subject = getter(subject_id)
+    if subject is not None:
+        memo[key] = subject
+        canonical_id = getattr(subject, "id", None)
+        if canonical_id is not None:
+            memo[(subject_type, str(canonical_id))] = subject
+    return subject
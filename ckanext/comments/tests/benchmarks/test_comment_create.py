@@ -0,0 +1,77 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Latency of `comments_comment_create`.
+
+Run with `pytest -s` to see the timings.
+"""
+
+import time
+
+import pytest
+
+import ckan.tests.factories as factories
+from ckan.tests.helpers import call_action
+
+ROUNDS = 50
+
+
+def _create(user, dataset, **kwargs):
+    return call_action(
+        "comments_comment_create",
+        {"user": user["name"]},
+        subject_id=dataset["id"],
+        subject_type="package",
+        content="content",
+        **kwargs,
+    )
+
+
+def _report(name, timings):
+    timings = sorted(timings)
+    mean = sum(timings) / len(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"\n{name} x{len(timings)}: mean {mean * 1000:.2f}ms, p95 {p95 * 1000:.2f}ms")
+
+
+@pytest.mark.usefixtures("clean_db")
+def test_comment_create_latency(count_queries):
+    user = factories.User()
+    datasets = [factories.Dataset() for _ in range(ROUNDS)]
+
+    first, existing, replies = [], [], []
+    for dataset in datasets:
+        start = time.perf_counter()
+        parent = _create(user, dataset, create_thread=True)
+        first.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        _create(user, dataset)
+        existing.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        _create(user, dataset, reply_to_id=parent["id"])
+        replies.append(time.perf_counter() - start)
+
+    _report("first comment with new thread", first)
+    _report("comment in existing thread", existing)
+    _report("reply", replies)
+
+    with count_queries() as counter:
+        _create(user, datasets[0])
+    print(f"queries per comment: {counter.count}")
+    assert counter.selects("comments_threads", datasets[0]["id"]) == 1
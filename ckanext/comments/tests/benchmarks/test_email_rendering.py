@@ -0,0 +1,75 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Rendering of notification emails.
+
+Run with `pytest -s` to see the timings.
+"""
+
+import timeit
+
+import pytest
+from jinja2 import Environment, FileSystemLoader
+
+from ckanext.comments import config, emails
+
+ROUNDS = 200
+
+
+def _fresh_render(path):
+    # rendering as it was done before the shared environment
+    env = Environment(loader=FileSystemLoader(path))
+    template = env.get_template("email_usuario.html")
+    return template.render(
+        email="user@example.com", mensaje="content", **emails._constants()
+    )
+
+
+@pytest.fixture
+def bytecode_cache(tmp_path, monkeypatch, ckan_config):
+    monkeypatch.setitem(ckan_config, config.CONFIG_EMAIL_BYTECODE_CACHE, str(tmp_path))
+    emails.reset()
+    yield tmp_path
+    emails.reset()
+
+
+def test_cached_environment_is_faster(bytecode_cache):
+    path = config.email_templates()
+
+    def cached():
+        return emails.render(
+            "email_usuario.html", email="user@example.com", mensaje="content"
+        )
+
+    assert cached() == _fresh_render(path)
+
+    fresh_time = timeit.timeit(lambda: _fresh_render(path), number=ROUNDS)
+    cached_time = timeit.timeit(cached, number=ROUNDS)
+    print(
+        f"\nemail_usuario.html x{ROUNDS}: "
+        f"fresh environment {fresh_time:.4f}s, cached {cached_time:.4f}s"
+    )
+    assert cached_time < fresh_time
+
+
+def test_bytecode_is_stored(bytecode_cache):
+    emails.render("email_usuario.html", email="user@example.com", mensaje="")
+    assert list(bytecode_cache.iterdir())
+
+    # a new process starts with an empty environment but reuses the bytecode
+    emails.reset()
+    emails.render("email_usuario.html", email="user@example.com", mensaje="")
@@ -15,12 +15,17 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
+import smtplib
+
 import pytest
+import sqlalchemy as sa
 
 import ckan.model as model
 from ckan.cli.db import _resolve_alembic_config
 
 import ckanext.comments.tests.factories as factories
+from ckanext.comments import blocked, mailer, recipients
 
 
 @pytest.fixture
@@ -28,6 +33,8 @@ def clean_db(reset_db, monkeypatch):
     reset_db()
     monkeypatch.setattr(model.repo, "_alembic_ini", _resolve_alembic_config("comments"))
     model.repo.upgrade_db()
+    blocked.reset()
+    recipients.invalidate()
 
 
 @pytest.fixture
@@ -38,3 +45,95 @@ def Thread():
 @pytest.fixture
 def Comment():
     return factories.Comment
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, *args, **kwargs):
+        self.count += 1
+        self.statements.append((statement, parameters))
+
+    def selects(self, table: str, value: str) -> int:
+        """Number of SELECTs from the table that use the value as parameter."""
+        return sum(
+            1
+            for statement, parameters in self.statements
+            if statement.lstrip().upper().startswith("SELECT")
+            and f"FROM {table}" in statement
+            and value in _values(parameters)
+        )
+
+
+def _values(parameters):
+    if isinstance(parameters, dict):
+        return list(parameters.values())
+    return list(parameters or [])
+
+
+@pytest.fixture
+def count_queries():
+    """Count SQL statements executed inside the `with` block."""
+
+    @contextlib.contextmanager
+    def counter():
+        listener = QueryCounter()
+        engine = model.Session.get_bind()
+        sa.event.listen(engine, "before_cursor_execute", listener)
+        try:
+            yield listener
+        finally:
+            sa.event.remove(engine, "before_cursor_execute", listener)
+
+    return counter
+
+
+class FakeSMTP:
+    """Local stand-in for the SMTP server."""
+
+    sent: list = []
+    connections = 0
+    fail = False
+    alive = True
+
+    def connect(self, *args, **kwargs):
+        if self.fail:
+            raise smtplib.SMTPConnectError(421, "unavailable")
+        type(self).connections += 1
+
+    def ehlo(self):
+        pass
+
+    def has_extn(self, name):
+        return False
+
+    def login(self, user, password):
+        pass
+
+    def noop(self):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected()
+        return 250, b"OK"
+
+    def sendmail(self, sender, recipients, message):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected()
+        self.sent.append((recipients, message))
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    monkeypatch.setattr(FakeSMTP, "sent", [])
+    monkeypatch.setattr(FakeSMTP, "connections", 0)
+    monkeypatch.setattr(FakeSMTP, "fail", False)
+    monkeypatch.setattr(FakeSMTP, "alive", True)
+    monkeypatch.setattr(mailer.smtplib, "SMTP", FakeSMTP)
+    mailer.close()
+    mailer.reset_metrics()
+    yield FakeSMTP
+    mailer.close()
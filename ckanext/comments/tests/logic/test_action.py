@@ -24,7 +24,16 @@ import ckan.plugins.toolkit as tk
 import ckan.tests.factories as factories
 from ckan.tests.helpers import call_action
 
+import ckanext.comments.model as c_model
 from ckanext.comments import config
+from ckanext.comments.logic import auth
+
+moderator_checks = []
+
+
+def moderator_checker(user, comment, thread):
+    moderator_checks.append(user.id)
+    return True
 
 
 @pytest.mark.usefixtures("clean_db")
@@ -113,6 +122,276 @@ class TestThreadShow:
 
         assert len(thread["comments"]) == 0
 
+    @pytest.mark.usefixtures("clean_db")
+    def test_thread_show_slim_authors(self, Thread, Comment):
+        user = factories.User(fullname="Slim Author")
+        t = Thread()
+        Comment(thread=t, user=user)
+        thread = call_action(
+            "comments_thread_show",
+            subject_id=t["subject_id"],
+            subject_type=t["subject_type"],
+            include_comments=True,
+            include_author=True,
+            author_fields=["id", "name", "fullname"],
+        )
+        assert thread["comments"][0]["author"] == {
+            "id": user["id"],
+            "name": user["name"],
+            "fullname": "Slim Author",
+        }
+
+        with pytest.raises(tk.ValidationError):
+            call_action(
+                "comments_thread_show",
+                subject_id=t["subject_id"],
+                subject_type=t["subject_type"],
+                include_comments=True,
+                include_author=True,
+                author_fields=["id", "apikey"],
+            )
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestThreadShowPagination:
+    def _pages(self, thread, **kwargs):
+        cursor = None
+        while True:
+            page = call_action(
+                "comments_thread_show",
+                subject_id=thread["subject_id"],
+                subject_type=thread["subject_type"],
+                include_comments=True,
+                combine_comments=True,
+                cursor=cursor,
+                **kwargs,
+            )
+            yield page
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
+    @pytest.mark.parametrize("newest_first", [False, True])
+    def test_pages(self, Thread, Comment, newest_first):
+        t = Thread()
+        top = [Comment(thread=t) for _ in range(5)]
+        reply = Comment(thread=t, reply_to_id=top[0]["id"])
+        nested = Comment(thread=t, reply_to_id=reply["id"])
+
+        pages = list(self._pages(t, limit=2, newest_first=newest_first))
+        assert [len(p["comments"]) for p in pages] == [2, 2, 1]
+
+        comments = [c for p in pages for c in p["comments"]]
+        keys = [(c["created_at"], c["id"]) for c in comments]
+        assert keys == sorted(keys, reverse=newest_first)
+        assert {c["id"] for c in comments} == {c["id"] for c in top}
+
+        first = next(c for c in comments if c["id"] == top[0]["id"])
+        assert [r["id"] for r in first["replies"]] == [reply["id"]]
+        assert [r["id"] for r in first["replies"][0]["replies"]] == [nested["id"]]
+
+    def test_without_limit(self, Thread, Comment):
+        t = Thread()
+        Comment(thread=t)
+        thread = call_action(
+            "comments_thread_show",
+            subject_id=t["subject_id"],
+            subject_type=t["subject_type"],
+            include_comments=True,
+        )
+        assert "next_cursor" not in thread
+        assert len(thread["comments"]) == 1
+
+    def test_max_depth(self, Thread, Comment):
+        t = Thread()
+        top = Comment(thread=t)
+        reply = Comment(thread=t, reply_to_id=top["id"])
+        Comment(thread=t, reply_to_id=reply["id"])
+
+        thread = call_action(
+            "comments_thread_show",
+            subject_id=t["subject_id"],
+            subject_type=t["subject_type"],
+            include_comments=True,
+            combine_comments=True,
+            limit=10,
+            max_depth=1,
+        )
+        first = thread["comments"][0]
+        assert [r["id"] for r in first["replies"]] == [reply["id"]]
+        assert first["replies"][0]["replies"] == []
+
+    def test_invalid_cursor(self, Thread):
+        t = Thread()
+        with pytest.raises(tk.ValidationError):
+            call_action(
+                "comments_thread_show",
+                subject_id=t["subject_id"],
+                subject_type=t["subject_type"],
+                include_comments=True,
+                limit=2,
+                cursor="not-a-cursor",
+            )
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestRepliesList:
+    def test_thread_without_replies(self, Thread, Comment):
+        t = Thread()
+        parent = Comment(thread=t)
+        Comment(thread=t)
+        Comment(thread=t, reply_to_id=parent["id"])
+
+        thread = call_action(
+            "comments_thread_show",
+            subject_id=t["subject_id"],
+            subject_type=t["subject_type"],
+            include_comments=True,
+            include_replies=False,
+        )
+        counts = {c["id"]: c["reply_count"] for c in thread["comments"]}
+        assert len(counts) == 2
+        assert counts[parent["id"]] == 1
+
+    def test_replies_list(self, Thread, Comment):
+        t = Thread()
+        parent = Comment(thread=t)
+        replies = [Comment(thread=t, reply_to_id=parent["id"]) for _ in range(3)]
+        Comment(thread=t, reply_to_id=replies[0]["id"])
+
+        page = call_action("comments_replies_list", id=parent["id"], limit=2)
+        assert [r["id"] for r in page["replies"]] == [r["id"] for r in replies[:2]]
+        assert page["replies"][0]["reply_count"] == 1
+        assert page["replies"][1]["reply_count"] == 0
+        assert page["replies"][0]["reply_to_content"] == parent["content"]
+
+        page = call_action(
+            "comments_replies_list",
+            id=parent["id"],
+            limit=2,
+            cursor=page["next_cursor"],
+        )
+        assert [r["id"] for r in page["replies"]] == [replies[2]["id"]]
+        assert page["next_cursor"] is None
+
+    def test_replies_preview_parent(self, Thread, Comment):
+        sysadmin = factories.Sysadmin()
+        t = Thread()
+        parent = Comment(thread=t, user=sysadmin)
+        reply = Comment(thread=t, reply_to_id=parent["id"])
+
+        page = call_action(
+            "comments_replies_list", id=parent["id"], include_author_label=True
+        )
+        assert [r["id"] for r in page["replies"]] == [reply["id"]]
+        assert page["replies"][0]["reply_to_content"] == parent["content"]
+        assert page["replies"][0]["reply_to_author_label"] == "datos.gob.es"
+
+    def test_replies_of_missing_comment(self):
+        with pytest.raises(tk.ObjectNotFound):
+            call_action("comments_replies_list", id="not-exist")
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestThreadSummary:
+    def test_missing_thread(self):
+        with pytest.raises(tk.ObjectNotFound):
+            call_action("comments_thread_summary", id="not-exist")
+
+    def test_counters(self, Thread, Comment):
+        t = Thread()
+        summary = call_action("comments_thread_summary", id=t["id"])
+        assert summary["comment_count"] == 0
+        assert summary["last_comment_at"] is None
+
+        first = Comment(thread=t)
+        Comment(thread=t, reply_to_id=first["id"])
+        second = Comment(thread=t)
+        call_action("comments_comment_approve", id=first["id"])
+        call_action("comments_comment_approve", id=first["id"])
+
+        summary = call_action("comments_thread_summary", id=t["id"])
+        assert summary["comment_count"] == 3
+        assert summary["approved_count"] == 1
+        assert summary["draft_count"] == 2
+        assert summary["last_comment_at"] == second["created_at"]
+
+        call_action("comments_comment_draft", id=first["id"])
+        summary = call_action("comments_thread_summary", id=t["id"])
+        assert summary["approved_count"] == 0
+        assert summary["draft_count"] == 3
+
+        call_action("comments_comment_delete", id=first["id"], subject="", body="")
+        summary = call_action("comments_thread_summary", id=t["id"])
+        assert summary["comment_count"] == 1
+        assert summary["draft_count"] == 1
+        assert summary["last_comment_at"] == second["created_at"]
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestThreadShowMany:
+    def test_thread_show_many(self, Thread, Comment, count_queries):
+        first = Thread()
+        second = Thread()
+        dataset = factories.Dataset()
+        comments = [Comment(thread=first) for _ in range(3)]
+        for comment in comments:
+            call_action("comments_comment_approve", id=comment["id"])
+        Comment(thread=second)
+
+        subjects = [
+            ["package", second["subject_id"]],
+            {"subject_type": "package", "subject_id": dataset["id"]},
+            ["package", first["subject_id"]],
+        ]
+        with count_queries() as counter:
+            result = call_action(
+                "comments_thread_show_many",
+                subjects=subjects,
+                include_counts=True,
+                latest=2,
+            )
+        assert counter.count <= 3
+
+        assert result[0]["id"] == second["id"]
+        assert result[0]["comment_count"] == 1
+        assert result[0]["comments"] == []
+        assert result[1] is None
+        assert result[2]["approved_count"] == 3
+        assert [c["id"] for c in result[2]["comments"]] == [
+            comments[2]["id"],
+            comments[1]["id"],
+        ]
+
+    def test_without_counts(self, Thread):
+        thread = Thread()
+        result = call_action(
+            "comments_thread_show_many",
+            subjects=[["package", thread["subject_id"]]],
+        )
+        assert result[0]["id"] == thread["id"]
+        assert "comment_count" not in result[0]
+        assert "last_comment_at" not in result[0]
+        assert result[0]["comments"] is None
+
+    def test_invalid_subjects(self):
+        with pytest.raises(tk.ValidationError):
+            call_action("comments_thread_show_many", subjects=[["package"]])
+
+    def test_limits(self):
+        with pytest.raises(tk.ValidationError):
+            call_action(
+                "comments_thread_show_many",
+                subjects=[["package", str(i)] for i in range(101)],
+            )
+
+        with pytest.raises(tk.ValidationError):
+            call_action(
+                "comments_thread_show_many",
+                subjects=[["package", "id"]],
+                latest=21,
+            )
+
 
 class TestThreadDelete:
     def test_cannot_delete_missing_thread(self):
@@ -197,6 +476,35 @@ class TestCommentCreate:
         assert comment["author_id"] == user["id"]
         assert comment["thread_id"] == thread["id"]
 
+    @pytest.mark.usefixtures("clean_db")
+    def test_create_thread(self):
+        user = factories.User()
+        dataset = factories.Dataset()
+
+        first = call_action(
+            "comments_comment_create",
+            {"user": user["name"]},
+            subject_id=dataset["name"],
+            subject_type="package",
+            content="first",
+            create_thread=True,
+        )
+        second = call_action(
+            "comments_comment_create",
+            {"user": user["name"]},
+            subject_id=dataset["id"],
+            subject_type="package",
+            content="second",
+            create_thread=True,
+        )
+        assert first["thread_id"] == second["thread_id"]
+
+        thread = call_action(
+            "comments_thread_show", subject_id=dataset["id"], subject_type="package"
+        )
+        assert thread["id"] == first["thread_id"]
+        assert thread["comment_count"] == 2
+
     @pytest.mark.usefixtures("clean_db")
     def test_existing_reply(self, Thread, Comment):
         user = factories.User()
@@ -277,6 +585,123 @@ class TestCommentDelete:
             call_action("comments_comment_show", id=c["id"])
 
 
+@pytest.mark.usefixtures("clean_db")
+@pytest.mark.ckan_config(
+    config.CONFIG_MODERATOR_CHECKER,
+    "ckanext.comments.tests.logic.test_action:moderator_checker",
+)
+class TestCapabilities:
+    def _comments(self, thread, user):
+        return call_action(
+            "comments_thread_show",
+            {"user": user},
+            subject_id=thread["subject_id"],
+            subject_type=thread["subject_type"],
+            include_comments=True,
+            include_capabilities=True,
+        )["comments"]
+
+    def test_checked_once_per_thread(self, Thread, Comment):
+        t = Thread()
+        for _ in range(3):
+            Comment(thread=t)
+        user = factories.User()
+        moderator_checks.clear()
+
+        comments = self._comments(t, user["name"])
+        assert moderator_checks == [user["id"]]
+        for comment in comments:
+            assert comment["can_approve"]
+            assert not comment["can_delete"]
+            assert not comment["can_draft"]
+            assert not comment["can_edit"]
+
+    def test_sysadmin(self, Thread, Comment):
+        t = Thread()
+        Comment(thread=t)
+        sysadmin = factories.Sysadmin()
+        moderator_checks.clear()
+
+        comment = self._comments(t, sysadmin["name"])[0]
+        assert not moderator_checks
+        assert comment["can_delete"] and comment["can_edit"]
+        assert comment["can_approve"] and comment["can_draft"]
+
+    def test_anonymous(self, Thread, Comment):
+        t = Thread()
+        Comment(thread=t)
+
+        comment = self._comments(t, "")[0]
+        assert not any(
+            comment[flag]
+            for flag in ["can_delete", "can_approve", "can_draft", "can_edit"]
+        )
+
+    def test_disabled_by_default(self, Thread, Comment):
+        t = Thread()
+        Comment(thread=t)
+        comment = call_action(
+            "comments_thread_show",
+            subject_id=t["subject_id"],
+            subject_type=t["subject_type"],
+            include_comments=True,
+        )["comments"][0]
+        assert "can_delete" not in comment
+
+
+@pytest.mark.usefixtures("clean_db")
+@pytest.mark.ckan_config(
+    config.CONFIG_MODERATOR_CHECKER,
+    "ckanext.comments.tests.logic.test_action:moderator_checker",
+)
+class TestCommentLoadedOnce:
+    def _context(self, user):
+        return {
+            "model": model,
+            "session": model.Session,
+            "user": user["name"],
+            "auth_user_obj": model.User.get(user["id"]),
+        }
+
+    @pytest.mark.parametrize(
+        "name, extra",
+        [
+            ("comment_show", {}),
+            ("comment_approve", {}),
+            ("comment_draft", {}),
+            ("comment_update", {"content": "updated"}),
+            ("comment_delete", {"subject": "", "body": ""}),
+        ],
+    )
+    def test_auth_shares_comment_with_action(
+        self, Comment, count_queries, name, extra
+    ):
+        sysadmin = factories.Sysadmin()
+        baseline = Comment()
+        comment = Comment()
+
+        with count_queries() as counter:
+            call_action(
+                f"comments_{name}", self._context(sysadmin), id=baseline["id"], **extra
+            )
+        expected = counter.selects("comments_comments", baseline["id"])
+
+        context = self._context(sysadmin)
+        with count_queries() as counter:
+            getattr(auth, name)(context, {"id": comment["id"]})
+            call_action(f"comments_{name}", context, id=comment["id"], **extra)
+        assert counter.selects("comments_comments", comment["id"]) == expected
+
+    def test_reply_loads_parent_once(self, Thread, Comment, count_queries):
+        user = factories.User()
+        thread = Thread()
+        parent = Comment(thread=thread)
+
+        with count_queries() as counter:
+            Comment(thread=thread, user=user, reply_to_id=parent["id"])
+        assert counter.selects("comments_comments", parent["id"]) == 1
+
+
 class TestCommentUpdate:
     def test_missing_comment(self, Comment):
         with pytest.raises(tk.ObjectNotFound):
@@ -295,3 +720,131 @@ class TestCommentUpdate:
         assert comment["content"] != c["content"]
         assert comment["content"] == content
         assert comment["modified_at"] > comment["created_at"]
+
+
+def _import_record(dataset, id_, created_at, **kwargs):
+    return dict(
+        id=id_,
+        subject_id=dataset["name"],
+        subject_type="package",
+        content=f"content of {id_}",
+        created_at=created_at,
+        **kwargs,
+    )
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestCommentImport:
+    def test_import(self):
+        dataset = factories.Dataset()
+        records = [
+            _import_record(dataset, "top", "2020-01-01T00:00:00", state="approved"),
+            _import_record(
+                dataset, "reply", "2020-01-02T00:00:00", reply_to_id="top"
+            ),
+            _import_record(dataset, "other", "2020-01-03T00:00:00", state="approved"),
+        ]
+
+        result = call_action("comments_comment_import", comments=records)
+        assert result == {"created": 3, "skipped": 0, "threads": 1}
+
+        thread = call_action(
+            "comments_thread_show",
+            subject_id=dataset["id"],
+            subject_type="package",
+            include_comments=True,
+            combine_comments=True,
+        )
+        assert thread["comment_count"] == 3
+        assert thread["approved_count"] == 2
+        assert thread["created_at"].startswith("2020-01-01")
+        assert [c["id"] for c in thread["comments"]] == ["top", "other"]
+        assert thread["comments"][0]["created_at"].startswith("2020-01-01")
+        assert [r["id"] for r in thread["comments"][0]["replies"]] == ["reply"]
+        assert not thread["comments"][0]["replies"][0]["approved"]
+        stored = model.Session.query(c_model.Comment).filter_by(id="top").one()
+        assert stored.author_id == ""
+
+        result = call_action("comments_comment_import", comments=records)
+        assert result == {"created": 0, "skipped": 3, "threads": 0}
+
+    def test_reply_to_stored_comment(self):
+        dataset = factories.Dataset()
+        call_action(
+            "comments_comment_import",
+            comments=[_import_record(dataset, "top", "2020-01-01T00:00:00")],
+        )
+        call_action(
+            "comments_comment_import",
+            comments=[
+                _import_record(
+                    dataset, "reply", "2020-01-02T00:00:00", reply_to_id="top"
+                )
+            ],
+        )
+
+        reply = model.Session.query(c_model.Comment).filter_by(id="reply").one()
+        assert reply.root_id == "top"
+        assert reply.depth == 1
+
+    def test_invalid_records(self):
+        dataset = factories.Dataset()
+        with pytest.raises(tk.ValidationError):
+            call_action(
+                "comments_comment_import",
+                comments=[
+                    _import_record(dataset, "top", "2020-01-01T00:00:00"),
+                    _import_record(dataset, "top", "2020-01-02T00:00:00"),
+                ],
+            )
+
+        with pytest.raises(tk.ValidationError):
+            # reply precedes its parent
+            call_action(
+                "comments_comment_import",
+                comments=[
+                    _import_record(
+                        dataset, "reply", "2020-01-02T00:00:00", reply_to_id="top"
+                    ),
+                    _import_record(dataset, "top", "2020-01-01T00:00:00"),
+                ],
+            )
+
+        with pytest.raises(tk.ValidationError):
+            call_action(
+                "comments_comment_import",
+                comments=[
+                    _import_record(
+                        dataset, "reply", "2020-01-02T00:00:00", reply_to_id="missing"
+                    )
+                ],
+            )
+
+        with pytest.raises(tk.ValidationError):
+            call_action(
+                "comments_comment_import",
+                comments=[
+                    dict(
+                        _import_record(dataset, "top", "2020-01-01T00:00:00"),
+                        subject_id="missing",
+                    )
+                ],
+            )
+
+    def test_no_notifications(self, smtp):
+        dataset = factories.Dataset()
+        call_action(
+            "comments_comment_import",
+            comments=[_import_record(dataset, "top", "2020-01-01T00:00:00")],
+        )
+        assert model.Session.query(c_model.EmailOutbox).count() == 0
+        assert not smtp.sent
+
+    def test_sysadmin_only(self):
+        user = factories.User()
+        with pytest.raises(tk.NotAuthorized):
+            call_action(
+                "comments_comment_import",
+                {"user": user["name"], "ignore_auth": False},
+                comments=[],
+            )
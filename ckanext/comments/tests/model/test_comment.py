@@ -72,3 +72,46 @@ class TestComment:
 
         comment.author_id = user["id"]
         assert comment.get_author().name == user["name"]
+
+    def test_tree_columns(self, Comment, Thread):
+        th = Thread()
+        root = Comment(thread=th)
+        reply = Comment(thread=th, reply_to_id=root["id"])
+        nested = Comment(thread=th, reply_to_id=reply["id"])
+
+        objects = {
+            c.id: c
+            for c in model.Session.query(c_model.Comment).filter(
+                c_model.Comment.id.in_([root["id"], reply["id"], nested["id"]])
+            )
+        }
+        r, p, n = objects[root["id"]], objects[reply["id"]], objects[nested["id"]]
+
+        assert (r.root_id, r.depth) == (r.id, 0)
+        assert (p.root_id, p.depth) == (r.id, 1)
+        assert (n.root_id, n.depth) == (r.id, 2)
+        assert n.path.startswith(p.path + "/")
+        assert p.path.startswith(r.path + "/")
+
+        assert [c.id for c in r.subtree()] == [p.id, n.id]
+        assert [c.id for c in r.subtree(max_depth=1)] == [p.id]
+        assert [c.id for c in p.subtree()] == [n.id]
+        assert n.subtree().count() == 0
+
+    def test_change_state(self, Comment):
+        comment_id = Comment()["id"]
+        comment = model.Session.query(c_model.Comment).filter_by(id=comment_id).one()
+        assert not comment.is_approved()
+
+        assert comment.change_state(c_model.Comment.State.approved)
+        assert comment.is_approved()
+        assert not comment.change_state(c_model.Comment.State.approved)
+
+        # another request changed the state after the comment was loaded
+        model.Session.execute(
+            c_model.Comment.__table__.update()
+            .where(c_model.Comment.id == comment.id)
+            .values(state=c_model.Comment.State.draft)
+        )
+        assert comment.is_approved()
+        assert not comment.change_state(c_model.Comment.State.draft)
@@ -24,7 +24,33 @@ import ckan.tests.factories as factories
 from ckan.tests.helpers import call_action
 
 import ckanext.comments.model as c_model
-from ckanext.comments.model.dictize import comment_dictize, thread_dictize
+from ckanext.comments.model.dictize import (
+    combine_comments,
+    comment_dictize,
+    thread_dictize,
+)
+
+
+@pytest.mark.parametrize(
+    "newest_first, replies_newest_first, top, replies",
+    [
+        (False, False, ["a", "b"], ["c", "d"]),
+        (True, False, ["b", "a"], ["c", "d"]),
+        (True, True, ["b", "a"], ["d", "c"]),
+    ],
+)
+def test_combine_comments_order(newest_first, replies_newest_first, top, replies):
+    comments = [
+        {"id": "d", "reply_to_id": "a", "created_at": "2026-01-01T00:00:04"},
+        {"id": "b", "reply_to_id": None, "created_at": "2026-01-01T00:00:02"},
+        {"id": "c", "reply_to_id": "a", "created_at": "2026-01-01T00:00:03.5"},
+        {"id": "a", "reply_to_id": None, "created_at": "2026-01-01T00:00:01"},
+    ]
+    tree = combine_comments(comments, newest_first, replies_newest_first)
+    assert [c["id"] for c in tree] == top
+
+    parent = next(c for c in tree if c["id"] == "a")
+    assert [c["id"] for c in parent["replies"]] == replies
 
 
 @pytest.mark.usefixtures("clean_db")
@@ -126,6 +152,87 @@ class TestDictize:
         )["comments"]
         assert len(comments) == 3
 
+    def test_thread_dictize_authors_loaded_once(self, Comment, Thread, count_queries):
+        user = factories.User()
+        th = Thread()
+        thread = model.Session.query(c_model.Thread).filter_by(id=th["id"]).one()
+        context = {
+            "model": model,
+            "user": "",
+            "include_comments": True,
+            "include_author": True,
+            "ignore_auth": True,
+        }
+
+        Comment(thread=th, user=user)
+        with count_queries() as counter:
+            thread_dictize(thread, context.copy())
+        baseline = counter.count
+
+        for _ in range(5):
+            Comment(thread=th, user=user)
+
+        with count_queries() as counter:
+            comments = thread_dictize(thread, context.copy())["comments"]
+
+        assert len(comments) == 6
+        assert all(c["author"]["id"] == user["id"] for c in comments)
+        assert counter.count == baseline
+
+    def test_thread_dictize_author_labels(self, Comment, Thread):
+        sysadmin = factories.Sysadmin()
+        editor = factories.User()
+        org = factories.Organization(
+            title="Publisher", users=[{"name": editor["name"], "capacity": "editor"}]
+        )
+        th = Thread()
+        Comment(thread=th, user=sysadmin)
+        Comment(thread=th, user=editor)
+
+        thread = model.Session.query(c_model.Thread).filter_by(id=th["id"]).one()
+        comments = thread_dictize(
+            thread,
+            {
+                "model": model,
+                "user": "",
+                "include_comments": True,
+                "include_author_label": True,
+                "ignore_auth": True,
+            },
+        )["comments"]
+
+        labels = {c["author_id"]: c["author_label"] for c in comments}
+        assert labels == {sysadmin["id"]: "datos.gob.es", editor["id"]: org["title"]}
+
+    def test_thread_dictize_reply_previews(self, Comment, Thread, count_queries):
+        sysadmin = factories.Sysadmin()
+        th = Thread()
+        parent = Comment(thread=th, user=sysadmin)
+        reply = Comment(thread=th, reply_to_id=parent["id"])
+        Comment(thread=th, reply_to_id=reply["id"])
+
+        thread = model.Session.query(c_model.Thread).filter_by(id=th["id"]).one()
+        context = {
+            "model": model,
+            "user": "",
+            "include_comments": True,
+            "include_author_label": True,
+            "ignore_auth": True,
+        }
+        comments = thread_dictize(thread, context)["comments"]
+        by_id = {c["id"]: c for c in comments}
+
+        assert "reply_to_content" not in by_id[parent["id"]]
+        assert by_id[reply["id"]]["reply_to_content"] == parent["content"]
+        assert by_id[reply["id"]]["reply_to_author_label"] == "datos.gob.es"
+
+        with count_queries() as shallow:
+            thread_dictize(thread, dict(context))
+        Comment(thread=th, reply_to_id=reply["id"])
+        with count_queries() as deep:
+            thread_dictize(thread, dict(context))
+        assert deep.count == shallow.count
+
     def test_thread_dictize_comments_filter_by_date(self, Comment, Thread):
         th = Thread()
         c1 = Comment(thread=th)
@@ -61,3 +61,14 @@ class TestThread:
         assert th.id is None
         assert th.subject_type == "package"
         assert th.subject_id == dataset["id"]
+
+    def test_upsert(self):
+        dataset = factories.Dataset()
+
+        thread_id = c_model.Thread.upsert("package", dataset["id"])
+        assert c_model.Thread.upsert("package", dataset["id"]) == thread_id
+
+        threads = model.Session.query(c_model.Thread).filter_by(
+            subject_id=dataset["id"]
+        )
+        assert [t.id for t in threads] == [thread_id]
@@ -0,0 +1,100 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+import ckan.model as model
+import ckan.plugins.toolkit as tk
+import ckan.tests.factories as factories
+from ckan.tests.helpers import call_action
+
+from ckanext.comments import blocked, config
+from ckanext.comments.model import BlockedEntity
+
+
+def _block(type_, id_):
+    call_action("comments_blocked_entity_create", subject_type=type_, subject_id=id_)
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestBlockedIndex:
+    def test_local_changes(self):
+        dataset = factories.Dataset()
+        assert not blocked.is_blocked("package", dataset["id"])
+
+        _block("package", dataset["id"])
+        assert blocked.is_blocked("package", dataset["id"])
+
+        call_action(
+            "comments_blocked_entity_delete",
+            subject_type="package",
+            subject_id=dataset["id"],
+        )
+        assert not blocked.is_blocked("package", dataset["id"])
+
+    def test_subject_name(self):
+        dataset = factories.Dataset()
+        _block("package", dataset["id"])
+        assert blocked.is_blocked("package", dataset["name"])
+
+    def test_no_queries_within_interval(self, count_queries):
+        dataset = factories.Dataset()
+        blocked.refresh(force=True)
+
+        with count_queries() as counter:
+            for _ in range(5):
+                assert not blocked.is_blocked("package", dataset["id"])
+        assert counter.count == 0
+
+    @pytest.mark.ckan_config(config.CONFIG_BLOCKED_REFRESH, "0")
+    def test_changes_of_other_workers(self):
+        dataset = factories.Dataset()
+        assert not blocked.is_blocked("package", dataset["id"])
+
+        # added by another process, without the local notification
+        model.Session.add(
+            BlockedEntity(subject_type="package", subject_id=dataset["id"])
+        )
+        model.Session.commit()
+        assert blocked.is_blocked("package", dataset["id"])
+
+        model.Session.query(BlockedEntity).delete()
+        model.Session.commit()
+        assert not blocked.is_blocked("package", dataset["id"])
+
+    def test_blocked_subject_rejects_comments(self, Thread):
+        thread = Thread()
+        _block(thread["subject_type"], thread["subject_id"])
+
+        with pytest.raises(tk.ValidationError):
+            call_action(
+                "comments_comment_create",
+                subject_id=thread["subject_id"],
+                subject_type=thread["subject_type"],
+                content="content",
+            )
+
+    def test_lookups_without_queries(self, count_queries):
+        blocked_dataset = factories.Dataset()
+        dataset = factories.Dataset()
+        _block("package", blocked_dataset["id"])
+        blocked.refresh(force=True)
+
+        with count_queries() as counter:
+            assert blocked.is_blocked("package", blocked_dataset["name"])
+            assert not blocked.is_blocked("package", dataset["id"])
+        assert counter.count == 0
@@ -0,0 +1,97 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from ckanext.comments import cache, signals
+
+
+class RedisStandIn:
+    """Minimal replacement for the redis client."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        value = self.data.get(key)
+        return value.encode("utf8") if isinstance(value, str) else value
+
+    def setex(self, key, ttl, value):
+        self.data[key] = str(value)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+
+@pytest.fixture
+def backend(request):
+    if request.param == "memory":
+        backend = cache.LRUBackend(10)
+    else:
+        backend = cache.RedisBackend(RedisStandIn())
+    cache.set_backend(backend)
+    yield backend
+    cache.reset_backend()
+
+
+class TestLRUBackend:
+    def test_eviction(self):
+        backend = cache.LRUBackend(2)
+        backend.set("a", "1", 0)
+        backend.set("b", "2", 0)
+        backend.get("a")
+        backend.set("c", "3", 0)
+
+        assert backend.get("a") == "1"
+        assert backend.get("b") is None
+        assert backend.get("c") == "3"
+
+    def test_expiration(self, monkeypatch):
+        backend = cache.LRUBackend(2)
+        backend.set("a", "1", 10)
+        now = cache.time.monotonic()
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now + 11)
+        assert backend.get("a") is None
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"], indirect=True)
+class TestFragments:
+    def test_roundtrip(self, backend):
+        key = cache.fragment_key(backend, "thread-id", "anonymous", "en")
+        assert cache.get_fragment(key) is None
+
+        cache.set_fragment(key, "<ul></ul>")
+        assert cache.get_fragment(key) == "<ul></ul>"
+
+    @pytest.mark.parametrize(
+        "signal",
+        [signals.created, signals.approved, signals.updated, signals.deleted],
+    )
+    def test_signals_invalidate_thread(self, backend, signal):
+        key = cache.fragment_key(backend, "thread-id", "anonymous")
+        other = cache.fragment_key(backend, "other-id", "anonymous")
+        cache.set_fragment(key, "old")
+        cache.set_fragment(other, "other")
+
+        signal.send("thread-id", comment={})
+
+        new_key = cache.fragment_key(backend, "thread-id", "anonymous")
+        assert new_key != key
+        assert cache.get_fragment(new_key) is None
+        assert cache.fragment_key(backend, "other-id", "anonymous") == other
@@ -0,0 +1,83 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+import ckan.model as model
+from ckan.tests import factories
+
+from ckanext.comments import config, digests
+from ckanext.comments.model import EmailOutbox, PendingNotification
+from ckanext.comments.tests import factories as comment_factories
+
+
+def _comment(dataset, **kwargs):
+    thread = comment_factories.Thread(subject_id=dataset["id"])
+    return comment_factories.Comment(
+        thread=thread, email="author@example.com", username="author", **kwargs
+    )
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestDigests:
+    @pytest.mark.ckan_config(config.CONFIG_DIGEST_ORGANIZATIONS, "*")
+    def test_one_email_per_organization(self, smtp):
+        editor = factories.User(email="editor@example.com")
+        org = factories.Organization(
+            users=[{"name": editor["name"], "capacity": "editor"}]
+        )
+        dataset = factories.Dataset(owner_org=org["id"])
+
+        _comment(dataset, content="first")
+        _comment(dataset, content="second")
+        assert model.Session.query(PendingNotification).count() == 2
+        organization_emails = model.Session.query(EmailOutbox).filter(
+            EmailOutbox.recipients.contains(["editor@example.com"])
+        )
+        assert organization_emails.count() == 0
+
+        assert digests.send_digests() == 1
+        assert model.Session.query(PendingNotification).count() == 0
+
+        row = organization_emails.one()
+        assert "first" in row.message
+        assert "second" in row.message
+
+        assert digests.send_digests() == 0
+
+    def test_enabled_for(self, ckan_config, monkeypatch):
+        org = factories.Organization()
+
+        assert not digests.enabled_for(org["id"])
+
+        monkeypatch.setitem(
+            ckan_config, config.CONFIG_DIGEST_ORGANIZATIONS, org["name"]
+        )
+        assert digests.enabled_for(org["id"])
+        assert not digests.enabled_for(factories.Organization()["id"])
+
+        monkeypatch.setitem(ckan_config, config.CONFIG_DIGEST_ORGANIZATIONS, "*")
+        assert digests.enabled_for(org["id"])
+        assert not digests.enabled_for(None)
+
+    @pytest.mark.ckan_config(config.CONFIG_DIGEST_ORGANIZATIONS, "*")
+    def test_without_editors(self, smtp):
+        dataset = factories.Dataset(owner_org=factories.Organization()["id"])
+        _comment(dataset)
+
+        assert digests.send_digests() == 0
+        assert model.Session.query(PendingNotification).count() == 0
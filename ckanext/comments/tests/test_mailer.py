@@ -0,0 +1,73 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+from ckan.lib.mailer import MailerException
+
+from ckanext.comments import config, mailer
+
+
+class TestMailer:
+    def test_connection_is_reused(self, smtp):
+        for idx in range(3):
+            mailer.send([f"{idx}@example.com"], "message")
+
+        assert len(smtp.sent) == 3
+        assert smtp.connections == 1
+        assert mailer.metrics()["reused"] == 2
+        assert mailer.metrics()["sent"] == 3
+
+    def test_dead_connection_is_replaced(self, smtp):
+        mailer.send(["a@example.com"], "message")
+        mailer._local.session.connection.noop = lambda: (421, b"closing")
+
+        mailer.send(["b@example.com"], "message")
+        assert smtp.connections == 2
+        assert len(smtp.sent) == 2
+
+    def test_dropped_connection_is_reopened(self, smtp):
+        mailer.send(["a@example.com"], "message")
+        mailer._local.session.connection.alive = False
+
+        mailer.send(["b@example.com"], "message")
+        assert smtp.connections == 2
+        assert len(smtp.sent) == 2
+
+    @pytest.mark.ckan_config(config.CONFIG_SMTP_MAX_MESSAGES, "2")
+    def test_connection_rotated(self, smtp):
+        for idx in range(5):
+            mailer.send([f"{idx}@example.com"], "message")
+        assert smtp.connections == 3
+
+    def test_send_many(self, smtp):
+        errors = mailer.send_many(
+            [(["a@example.com"], "first"), (["b@example.com"], "second")]
+        )
+        assert errors == [None, None]
+        assert [message for _r, message in smtp.sent] == ["first", "second"]
+        assert smtp.connections == 1
+        assert mailer.metrics()["send_seconds"] >= 0
+
+    def test_failure(self, smtp):
+        smtp.fail = True
+        errors = mailer.send_many([(["a@example.com"], "message")])
+        assert isinstance(errors[0], MailerException)
+        assert mailer.metrics()["failed"] == 1
+
+        with pytest.raises(MailerException):
+            mailer.send(["a@example.com"], "message")
@@ -0,0 +1,116 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from datetime import datetime
+from email.mime.text import MIMEText
+
+import pytest
+
+import ckan.model as model
+
+from ckanext.comments import config, outbox
+from ckanext.comments.model import EmailOutbox
+
+
+def _message():
+    msg = MIMEText("hello")
+    msg["Subject"] = "test"
+    return msg
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestOutbox:
+    def test_stored_with_transaction(self, smtp):
+        outbox.enqueue("a@example.com", _message())
+        model.Session.rollback()
+        assert model.Session.query(EmailOutbox).count() == 0
+
+        outbox.enqueue(["a@example.com", "", "b@example.com"], _message())
+        model.Session.commit()
+
+        row = model.Session.query(EmailOutbox).one()
+        assert row.recipients == ["a@example.com", "b@example.com"]
+        assert not smtp.sent
+
+    def test_deliver(self, smtp):
+        outbox.enqueue("a@example.com", _message())
+        model.Session.commit()
+
+        assert outbox.deliver_pending() == (1, 0)
+        assert smtp.sent[0][0] == ["a@example.com"]
+
+        row = model.Session.query(EmailOutbox).one()
+        assert row.sent_at
+        assert outbox.deliver_pending() == (0, 0)
+
+    def test_retry_with_backoff(self, smtp):
+        outbox.enqueue("a@example.com", _message())
+        model.Session.commit()
+
+        smtp.fail = True
+        assert outbox.deliver_pending() == (0, 1)
+        row = model.Session.query(EmailOutbox).one()
+        assert row.attempts == 1
+        assert row.last_error
+        assert row.next_attempt_at > datetime.utcnow()
+
+        # not due yet
+        smtp.fail = False
+        assert outbox.deliver_pending() == (0, 0)
+
+        row.next_attempt_at = datetime.utcnow()
+        model.Session.commit()
+        assert outbox.deliver_pending() == (1, 0)
+
+    @pytest.mark.ckan_config(config.CONFIG_OUTBOX_MAX_ATTEMPTS, "1")
+    @pytest.mark.ckan_config(config.CONFIG_OUTBOX_RETRY_DELAY, "0")
+    def test_max_attempts(self, smtp):
+        outbox.enqueue("a@example.com", _message())
+        model.Session.commit()
+
+        smtp.fail = True
+        assert outbox.deliver_pending() == (0, 1)
+        smtp.fail = False
+        assert outbox.deliver_pending() == (0, 0)
+
+    @pytest.mark.ckan_config(config.CONFIG_EMAIL_DELIVERY, "direct")
+    def test_direct_delivery(self, smtp):
+        outbox.enqueue("a@example.com", _message())
+        assert not smtp.sent
+
+        model.Session.commit()
+        outbox.schedule_delivery()
+        assert len(smtp.sent) == 1
+        assert model.Session.query(EmailOutbox).count() == 0
+
+        outbox.enqueue("a@example.com", _message())
+        model.Session.rollback()
+        outbox.schedule_delivery()
+        assert len(smtp.sent) == 1
+
+    def test_job_only_for_stored_emails(self, monkeypatch):
+        jobs = []
+        monkeypatch.setattr(outbox.tk, "enqueue_job", lambda *a, **kw: jobs.append(a))
+
+        outbox.schedule_delivery()
+        assert not jobs
+
+        outbox.enqueue("a@example.com", _message())
+        model.Session.commit()
+        outbox.schedule_delivery()
+        outbox.schedule_delivery()
+        assert len(jobs) == 1
@@ -0,0 +1,80 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+import ckan.tests.factories as factories
+import ckan.tests.helpers as helpers
+
+from ckanext.comments import config, recipients
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestEditorEmails:
+    def test_active_editors(self):
+        editor = factories.User(email="editor@example.com")
+        member = factories.User(email="member@example.com")
+        deleted = factories.User(email="deleted@example.com")
+        org = factories.Organization(
+            users=[
+                {"name": editor["name"], "capacity": "editor"},
+                {"name": member["name"], "capacity": "member"},
+                {"name": deleted["name"], "capacity": "editor"},
+            ]
+        )
+        helpers.call_action("user_delete", id=deleted["id"])
+
+        assert recipients.editor_emails(org["id"]) == ("editor@example.com",)
+        assert recipients.editor_emails(None) == ()
+
+    def test_cached(self, count_queries):
+        editor = factories.User(email="editor@example.com")
+        org = factories.Organization(
+            users=[{"name": editor["name"], "capacity": "editor"}]
+        )
+
+        with count_queries() as counter:
+            for _ in range(3):
+                assert recipients.editor_emails(org["id"]) == ("editor@example.com",)
+        assert counter.count == 1
+
+    @pytest.mark.ckan_config(config.CONFIG_RECIPIENTS_CACHE_TTL, "0")
+    def test_cache_disabled(self, count_queries):
+        org = factories.Organization()
+        with count_queries() as counter:
+            recipients.editor_emails(org["id"])
+            recipients.editor_emails(org["id"])
+        assert counter.count == 2
+
+    @pytest.mark.skipif(
+        recipients.action_succeeded is None, reason="CKAN does not send signals"
+    )
+    def test_invalidated_by_member_changes(self):
+        org = factories.Organization()
+        assert recipients.editor_emails(org["id"]) == ()
+
+        editor = factories.User(email="editor@example.com")
+        helpers.call_action(
+            "organization_member_create",
+            id=org["id"],
+            username=editor["name"],
+            role="editor",
+        )
+        assert recipients.editor_emails(org["id"]) == ("editor@example.com",)
+
+        helpers.call_action("user_patch", id=editor["id"], email="new@example.com")
+        assert recipients.editor_emails(org["id"]) == ("new@example.com",)
@@ -0,0 +1,81 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+from types import SimpleNamespace
+
+import pytest
+
+import ckan.tests.factories as factories
+
+from ckanext.comments import subject
+from ckanext.comments.exceptions import UnsupportedSubjectType
+
+
+def custom_getter(id_):
+    return SimpleNamespace(id=id_)
+
+
+@pytest.fixture
+def registry():
+    yield
+    subject.reset()
+
+
+@pytest.mark.usefixtures("registry")
+class TestRegistry:
+    def test_defaults(self):
+        subject.configure({})
+        assert subject.get_getter("package") is subject.package_getter
+
+        with pytest.raises(UnsupportedSubjectType):
+            subject.get_getter("question")
+
+    def test_custom_getter(self):
+        subject.configure(
+            {
+                "ckanext.comments.subject.question_getter": (
+                    "ckanext.comments.tests.test_subject:custom_getter"
+                ),
+            }
+        )
+        assert subject.get_getter("question") is custom_getter
+        assert subject.locate("question", "1") == SimpleNamespace(id="1")
+
+    def test_missing_getter_is_ignored(self):
+        subject.configure({"ckanext.comments.subject.package_getter": "not.a:getter"})
+        assert subject.get_getter("package") is subject.package_getter
+
+
+@pytest.mark.usefixtures("clean_db", "registry")
+class TestLocate:
+    def test_memoized_per_request(self, app, count_queries):
+        dataset = factories.Dataset()
+
+        with app.flask_app.test_request_context():
+            with count_queries() as counter:
+                by_name = subject.locate("package", dataset["name"])
+                by_id = subject.locate("package", dataset["id"])
+            assert by_name is by_id
+            assert counter.count == 1
+
+    def test_not_memoized_outside_of_request(self, count_queries):
+        dataset = factories.Dataset()
+
+        with count_queries() as counter:
+            subject.locate("package", dataset["id"])
+            subject.locate("package", dataset["id"])
+        assert counter.count == 2
@@ -0,0 +1,216 @@
+# Copyright (C) 2026 Entidad Pública Empresarial Red.es
+#
+# This file is part of "comments (datos.gob.es)".
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+import sqlalchemy as sa
+
+import ckan.model as model
+import ckan.tests.factories as factories
+
+from ckanext.comments import config, utils
+from ckanext.comments.model import UserRole
+
+
+@pytest.fixture
+def drupal_db(tmp_path, monkeypatch):
+    """SQLite stand-in for the tables of the Drupal database."""
+    url = f"sqlite:///{tmp_path / 'drupal.db'}"
+    engine = sa.create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(
+            sa.text(
+                "CREATE TABLE user__field_ckan_user_id"
+                " (entity_id INTEGER, field_ckan_user_id_value TEXT)"
+            )
+        )
+        conn.execute(
+            sa.text("CREATE TABLE user__roles (entity_id INTEGER, roles_target_id TEXT)")
+        )
+        conn.execute(
+            sa.text("CREATE TABLE users_field_data (uid INTEGER, changed INTEGER)")
+        )
+    engine.dispose()
+
+    monkeypatch.setattr(config, "drupal_connection", lambda: url)
+    utils.reset_drupal_engine()
+    yield url
+    utils.reset_drupal_engine()
+
+
+def _add_user(url, entity_id, user_id, *roles, changed=1):
+    engine = sa.create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(
+            sa.text("INSERT INTO user__field_ckan_user_id VALUES (:e, :u)"),
+            {"e": entity_id, "u": user_id},
+        )
+        conn.execute(
+            sa.text("INSERT INTO users_field_data VALUES (:e, :c)"),
+            {"e": entity_id, "c": changed},
+        )
+        for role in roles:
+            conn.execute(
+                sa.text("INSERT INTO user__roles VALUES (:e, :r)"),
+                {"e": entity_id, "r": role},
+            )
+    engine.dispose()
+
+
+class TestDrupalRoles:
+    def test_engine_is_shared(self, drupal_db):
+        assert utils.drupal_engine() is utils.drupal_engine()
+
+    def test_missing_connection(self, monkeypatch):
+        monkeypatch.setattr(config, "drupal_connection", lambda: None)
+        utils.reset_drupal_engine()
+        with pytest.raises(RuntimeError):
+            utils.drupal_engine()
+
+    def test_bulk_roles(self, drupal_db):
+        _add_user(drupal_db, 1, "a", "editor", "reviewer")
+        _add_user(drupal_db, 2, "b", "editor")
+
+        roles = utils.get_roles_by_author_ids(["a", "b", "c"])
+        assert sorted(roles["a"]) == ["editor", "reviewer"]
+        assert roles["b"] == ("editor",)
+        assert roles["c"] == ()
+
+    def test_roles_are_cached(self, drupal_db):
+        _add_user(drupal_db, 1, "a", "editor")
+        statements = []
+        sa.event.listen(
+            utils.drupal_engine(),
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        utils.get_roles_by_author_ids(["a", "b"])
+        assert len(statements) == 1
+
+        utils.get_roles_by_author_ids(["a", "b"])
+        assert len(statements) == 1
+
+        utils.get_roles_by_author_ids(["a", "c"])
+        assert len(statements) == 2
+
+    @pytest.mark.ckan_config(config.CONFIG_ROLES_CACHE_TTL, "0")
+    def test_cache_can_be_disabled(self, drupal_db):
+        _add_user(drupal_db, 1, "a")
+        assert utils.get_roles_by_author_ids(["a"])["a"] == ()
+
+        _add_user(drupal_db, 2, "a", "editor")
+        assert utils.get_roles_by_author_ids(["a"])["a"] == ("editor",)
+
+
+def _set_roles(url, entity_id, changed, *roles):
+    engine = sa.create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(
+            sa.text("DELETE FROM user__roles WHERE entity_id = :e"), {"e": entity_id}
+        )
+        for role in roles:
+            conn.execute(
+                sa.text("INSERT INTO user__roles VALUES (:e, :r)"),
+                {"e": entity_id, "r": role},
+            )
+        conn.execute(
+            sa.text("UPDATE users_field_data SET changed = :c WHERE uid = :e"),
+            {"e": entity_id, "c": changed},
+        )
+    engine.dispose()
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestSyncRoles:
+    def test_full_sync(self, drupal_db):
+        _add_user(drupal_db, 1, "a", "editor", "reviewer")
+        _add_user(drupal_db, 2, "b")
+
+        assert utils.sync_user_roles(full=True) == 2
+        roles = UserRole.by_users(["a", "b"])
+        assert sorted(roles["a"]) == ["editor", "reviewer"]
+        assert roles["b"] == ()
+
+    def test_incremental_sync(self, drupal_db):
+        _add_user(drupal_db, 1, "a", "editor", changed=10)
+        _add_user(drupal_db, 2, "b", "editor", changed=20)
+        utils.sync_user_roles()
+
+        _set_roles(drupal_db, 1, 30)
+        _add_user(drupal_db, 3, "c", "reviewer", changed=40)
+
+        # the newest user of the previous sync is copied again, in case
+        # there were other changes at the same second
+        assert utils.sync_user_roles() == 3
+        roles = UserRole.by_users(["a", "b", "c"])
+        assert roles == {"a": (), "b": ("editor",), "c": ("reviewer",)}
+
+    @pytest.mark.ckan_config(config.CONFIG_ROLES_SOURCE, "local")
+    def test_local_source(self, drupal_db):
+        _add_user(drupal_db, 1, "a", "editor")
+        utils.sync_user_roles()
+        utils.reset_drupal_engine()
+
+        _set_roles(drupal_db, 1, 2, "reviewer")
+        assert utils.get_roles_by_author_ids(["a"]) == {"a": ("editor",)}
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestSameOrganization:
+    def test_editor(self):
+        editor = factories.User()
+        member = factories.User()
+        org = factories.Organization(
+            users=[
+                {"name": editor["name"], "capacity": "editor"},
+                {"name": member["name"], "capacity": "member"},
+            ]
+        )
+        dataset = factories.Dataset(owner_org=org["id"])
+
+        assert utils.user_belong_to_same_organization(
+            model.User.get(editor["id"]), dataset["id"]
+        )
+        assert utils.user_belong_to_same_organization(
+            model.User.get(editor["id"]), dataset["name"]
+        )
+        assert not utils.user_belong_to_same_organization(
+            model.User.get(member["id"]), dataset["id"]
+        )
+
+    def test_other_organization(self):
+        editor = factories.User()
+        factories.Organization(users=[{"name": editor["name"], "capacity": "editor"}])
+        dataset = factories.Dataset(owner_org=factories.Organization()["id"])
+
+        assert not utils.user_belong_to_same_organization(
+            model.User.get(editor["id"]), dataset["id"]
+        )
+
+    def test_memoized_per_request(self, app, count_queries):
+        editor = factories.User()
+        org = factories.Organization(
+            users=[{"name": editor["name"], "capacity": "editor"}]
+        )
+        dataset = factories.Dataset(owner_org=org["id"])
+        user = model.User.get(editor["id"])
+
+        with app.flask_app.test_request_context():
+            with count_queries() as counter:
+                for _ in range(3):
+                    assert utils.user_belong_to_same_organization(user, dataset["id"])
+            assert counter.count == 1
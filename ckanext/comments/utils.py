@@ -16,24 +16,31 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 from __future__ import annotations
-from typing import Any
+import base64
+import json
+import threading
+from datetime import datetime
+from typing import Any, Iterable, Optional
 
 import ckan.model as model
+from ckan.common import _
 
 import logging
 log = logging.getLogger(__name__)
-from ckan.plugins.toolkit import config as conf
+import flask
 import sqlalchemy as sa
 from sqlalchemy.orm import class_mapper
 from sqlalchemy import inspect
-from ckan.plugins import toolkit
 
 from . import config
+from .model import UserRole
 
 ROLE_ADMINISTRATOR = 'xxx'
 ROLE_APORTA = 'yyy'
 ROLE_PUBLICADOR = 'zzz'
 
+ADMIN_AUTHOR_LABEL = "datos.gob.es"
+
 def comments_is_moderator(user: model.User, comment: Any, thread: Any) -> bool:
     return ( can_approve_comment_by_role(user,None,thread.subject_id) or user.sysadmin)
     
@@ -43,44 +50,258 @@ def is_moderator(user: model.User, comment: Any, thread: Any) -> bool:
     func = config.moderator_checker() or comments_is_moderator
     return func(user, comment, thread)
 
-def get_roles_by_author_id(author):
-    
-    engine = sa.create_engine(conf.get('ckanext.dge_drupal_users.connection'))
-    return engine.execute(
-        'SELECT ur.roles_target_id role FROM user__roles ur '
-        ' INNER JOIN user__field_ckan_user_id u on u.entity_id = ur.entity_id'
-        ' WHERE u.field_ckan_user_id_value=%s',
-        str(author.id))
-   
-        
+_drupal_engine: Optional[Any] = None
+_drupal_lock = threading.Lock()
+
+_roles_cache: Optional[Any] = None
+ROLES_CACHE_SIZE = 10000
+
+_roles_query = sa.text(
+    "SELECT u.field_ckan_user_id_value AS user_id, ur.roles_target_id AS role"
+    " FROM user__roles ur"
+    " INNER JOIN user__field_ckan_user_id u ON u.entity_id = ur.entity_id"
+    " WHERE u.field_ckan_user_id_value IN :ids"
+).bindparams(sa.bindparam("ids", expanding=True))
+
+
+_changed_roles_query = sa.text(
+    "SELECT u.field_ckan_user_id_value AS user_id, ur.roles_target_id AS role,"
+    " ufd.changed AS changed"
+    " FROM user__field_ckan_user_id u"
+    " INNER JOIN users_field_data ufd ON ufd.uid = u.entity_id"
+    " LEFT JOIN user__roles ur ON ur.entity_id = u.entity_id"
+    " WHERE ufd.changed >= :since"
+)
+
+
+def drupal_engine() -> Any:
+    """Engine of the Drupal database, shared by the whole process."""
+    global _drupal_engine
+    if _drupal_engine is None:
+        with _drupal_lock:
+            if _drupal_engine is None:
+                _drupal_engine = _make_drupal_engine(config.drupal_connection())
+    return _drupal_engine
+
+
+def _make_drupal_engine(url: Optional[str]) -> Any:
+    if not url:
+        raise RuntimeError(f"{config.CONFIG_DRUPAL_CONNECTION} is not configured")
+
+    options: dict[str, Any] = {"pool_pre_ping": True}
+    # SQLite engines do not use QueuePool and reject its options
+    if sa.engine.url.make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=config.drupal_pool_size(),
+            max_overflow=config.drupal_max_overflow(),
+            pool_recycle=config.drupal_pool_recycle(),
+        )
+    return sa.create_engine(url, **options)
+
+
+def reset_drupal_engine():
+    """Close connections of the Drupal engine and forget cached roles."""
+    global _drupal_engine, _roles_cache
+    with _drupal_lock:
+        if _drupal_engine is not None:
+            _drupal_engine.dispose()
+        _drupal_engine = None
+        _roles_cache = None
+
+
+def _get_roles_cache() -> Any:
+    global _roles_cache
+    if _roles_cache is None:
+        from .cache import LRUBackend
+
+        _roles_cache = LRUBackend(ROLES_CACHE_SIZE)
+    return _roles_cache
+
+
+def get_roles_by_author_ids(author_ids: Iterable[str]) -> dict[str, tuple[str, ...]]:
+    """Drupal roles of the CKAN users.
+
+    Roles of users that are not cached yet are fetched by a single query.
+    Users without roles are mapped to an empty tuple. When roles are
+    mirrored locally, they are taken from the CKAN database.
+    """
+    if config.roles_source() == "local":
+        return UserRole.by_users(author_ids)
+
+    ids = {str(id_) for id_ in author_ids if id_}
+    cache = _get_roles_cache()
+    ttl = config.roles_cache_ttl()
+
+    roles: dict[str, tuple[str, ...]] = {}
+    for id_ in ids:
+        cached = cache.get(id_) if ttl else None
+        if cached is not None:
+            roles[id_] = cached
+
+    missing = ids - set(roles)
+    if missing:
+        fetched: dict[str, list[str]] = {id_: [] for id_ in missing}
+        with drupal_engine().connect() as conn:
+            for row in conn.execute(_roles_query, {"ids": sorted(missing)}):
+                fetched[str(row.user_id)].append(row.role)
+
+        for id_, user_roles in fetched.items():
+            roles[id_] = tuple(user_roles)
+            if ttl:
+                cache.set(id_, roles[id_], ttl)
+
+    return roles
+
+
+def get_roles_by_author_id(author: model.User) -> tuple[str, ...]:
+    return get_roles_by_author_ids([author.id]).get(str(author.id), ())
+
+
+def sync_user_roles(full: bool = False) -> int:
+    """Copy Drupal roles into the comments_user_roles table.
+
+    Only users changed in Drupal since the previous sync are copied, unless
+    `full` is enabled. Returns the number of synced users.
+    """
+    since = 0 if full else UserRole.last_change()
+
+    roles: dict[str, list[str]] = {}
+    changed: dict[str, int] = {}
+    with drupal_engine().connect() as conn:
+        for row in conn.execute(_changed_roles_query, {"since": since}):
+            user_id = str(row.user_id)
+            user_roles = roles.setdefault(user_id, [])
+            if row.role:
+                user_roles.append(row.role)
+            changed[user_id] = max(changed.get(user_id, 0), int(row.changed))
+
+    if full:
+        UserRole.clear()
+    UserRole.replace(roles, changed)
+    model.Session.commit()
+
+    log.info("Synced Drupal roles of %d users", len(roles))
+    return len(roles)
+
 
 def can_approve_comment_by_role(author,comment,thread_id):
     if author is not None:
-           
-            rows = get_roles_by_author_id(author)
-
-            for row in rows:
-                if row.role == ROLE_ADMINISTRATOR or row.role == ROLE_APORTA:
-                    return True
-                if row.role == ROLE_PUBLICADOR and user_belong_to_same_organization(author,thread_id):
-                    return True
+        for role in get_roles_by_author_id(author):
+            if role == ROLE_ADMINISTRATOR or role == ROLE_APORTA:
+                return True
+            if role == ROLE_PUBLICADOR and user_belong_to_same_organization(author,thread_id):
+                return True
     return False
 
-def user_belong_to_same_organization( author, thread_id):
-    email_belong_to = False
-
-    user_author = model.User.get(author.id)
-    email_commenting_user = user_author.email
-    package = model.Package.get(thread_id)
-    members = toolkit.get_action('member_list')(
-        data_dict={'id': package.owner_org, 'table_name': 'user', 'capacity': 'editor', 'state': 'active'})
-
-    for member in members:
-        user = model.User.get(member[0])
-        if user:
-            if user.email == email_commenting_user:
-            	email_belong_to = True
-    return email_belong_to
+def request_cache(name: str) -> dict[Any, Any]:
+    """Storage that lives until the end of the current request.
+
+    Outside of a request every call returns a new empty dictionary, so
+    nothing is memoized.
+    """
+    if not flask.has_request_context():
+        return {}
+
+    storage = getattr(flask.g, "_comments_request_cache", None)
+    if storage is None:
+        storage = flask.g._comments_request_cache = {}
+    return storage.setdefault(name, {})
+
+
+def user_belong_to_same_organization(author: model.User, package_id: str) -> bool:
+    """Check if a user with the author's email is an active editor of the
+    package's organization.
+    """
+    memo = request_cache("same_organization")
+    key = (author.id, package_id)
+    if key not in memo:
+        memo[key] = _user_belong_to_same_organization(author, package_id)
+    return memo[key]
+
+
+def _user_belong_to_same_organization(author: model.User, package_id: str) -> bool:
+    if not author.email:
+        return False
+
+    editors = (
+        model.Session.query(model.Member.id)
+        .join(model.Package, model.Package.owner_org == model.Member.group_id)
+        .join(model.User, model.User.id == model.Member.table_id)
+        .filter(
+            sa.or_(model.Package.id == package_id, model.Package.name == package_id),
+            model.Member.table_name == "user",
+            model.Member.capacity == "editor",
+            model.Member.state == "active",
+            model.User.email == author.email,
+        )
+    )
+    return model.Session.query(editors.exists()).scalar()
+
+def get_author_labels(author_ids: Iterable[str]) -> dict[str, Optional[str]]:
+    """Public labels of the given authors, resolved with a single query.
+
+    Sysadmins are shown as the portal, the rest of users by the title of
+    their organization. Authors without organization are mapped to None.
+    """
+    ids = {id_ for id_ in author_ids if id_}
+    if not ids:
+        return {}
+
+    rows = (
+        model.Session.query(model.User.id, model.User.sysadmin, model.Group.title)
+        .outerjoin(
+            model.Member,
+            sa.and_(
+                model.Member.table_id == model.User.id,
+                model.Member.table_name == "user",
+                model.Member.state == "active",
+            ),
+        )
+        .outerjoin(
+            model.Group,
+            sa.and_(
+                model.Group.id == model.Member.group_id,
+                model.Group.type == "organization",
+                model.Group.state == "active",
+            ),
+        )
+        .filter(model.User.id.in_(ids))
+        .order_by(model.User.id, model.Group.title)
+    )
+
+    labels: dict[str, Optional[str]] = {}
+    for user_id, sysadmin, title in rows:
+        if sysadmin:
+            labels[user_id] = ADMIN_AUTHOR_LABEL
+        elif not labels.get(user_id):
+            labels[user_id] = title
+    return labels
+
+
+def author_label(comment: dict[str, Any], labels: dict[str, Optional[str]]) -> str:
+    """Name shown as the author of the comment."""
+    author_id = comment.get("author_id")
+    label = labels.get(author_id) if author_id else None
+    return label or comment.get("username") or _("anonymous")
+
+
+def encode_cursor(created_at: datetime, id_: str) -> str:
+    """Opaque position of the comment for keyset pagination."""
+    position = json.dumps([created_at.isoformat(), id_])
+    return base64.urlsafe_b64encode(position.encode("utf8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Position encoded by `encode_cursor`.
+
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        created_at, id_ = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), str(id_)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
 
 def obj_to_dict_prefix(obj, prefix=''):
     return {prefix + c.key: getattr(obj, c.key) for c in inspect(obj).mapper.column_attrs}